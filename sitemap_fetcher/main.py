@@ -1,6 +1,7 @@
 """Main entry point for the Sitemap URL Fetcher application."""
 
 import argparse
+import logging
 import sys
 import json
 import xml.etree.ElementTree as ET
@@ -32,6 +33,12 @@ def main():
         action="store_true",
         help="Resume from saved state.",
     )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Re-check every sitemap from saved state (implies --resume), "
+        "skipping those unchanged since the last run via ETag/Last-Modified.",
+    )
     parser.add_argument(
         "--state-file",
         default=None,
@@ -44,13 +51,65 @@ def main():
         default=30,
         help="HTTP request timeout",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of sitemaps downloaded at once (default: 8).",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries for connection errors and 429/5xx responses, with "
+        "exponential back-off (default: 3).",
+    )
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=0,
+        help="Parse sitemaps in this many worker processes instead of while "
+        "streaming them (default: 0, streaming).",
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Also log debug messages.",
+    )
+    verbosity.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Only log warnings and errors, not per-sitemap progress.",
+    )
 
     args = parser.parse_args()
 
+    # Progress goes to stderr; at WARNING level the per-sitemap messages are
+    # never even formatted
+    if args.verbose:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    logging.basicConfig(level=level, stream=sys.stderr, format="%(message)s")
+
     # --- Argument Validation ---
     if args.limit is not None and args.limit <= 0:
         print("Error: --limit must be a positive integer.", file=sys.stderr)
         sys.exit(1)
+    if args.concurrency <= 0:
+        print("Error: --concurrency must be a positive integer.", file=sys.stderr)
+        sys.exit(1)
+    if args.max_retries < 0:
+        print("Error: --max-retries must not be negative.", file=sys.stderr)
+        sys.exit(1)
+    if args.parse_processes < 0:
+        print("Error: --parse-processes must not be negative.", file=sys.stderr)
+        sys.exit(1)
 
     # Create the configuration object
     config = ProcessorConfig(
@@ -58,8 +117,12 @@ def main():
         output_file=args.output_file,
         state_file=args.state_file,
         limit=args.limit,
-        resume=args.resume,
+        resume=args.resume or args.refresh,
+        refresh=args.refresh,
         fetcher_timeout=args.timeout,
+        fetcher_max_retries=args.max_retries,
+        concurrency=args.concurrency,
+        parse_processes=args.parse_processes,
     )
 
     # Instantiate the processor with the config object
@@ -1,11 +1,47 @@
 """Module for parsing sitemap XML content."""
 
 import xml.etree.ElementTree as ET
-from typing import List
+from typing import BinaryIO, Generator, List, Tuple
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # pragma: no cover - lxml is an optional speed‑up
+    lxml_etree = None
 
 # Namespace for sitemap XML files
 NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
 
+# Compiled once: collects non-blank <loc> text in C, returning plain ``str``
+# objects (``smart_strings=False`` avoids keeping a reference to the tree).
+_LOC_XPATH = (
+    lxml_etree.XPath(
+        ".//s:loc/text()[normalize-space()]",
+        namespaces={"s": NAMESPACE},
+        smart_strings=False,
+    )
+    if lxml_etree is not None
+    else None
+)
+
+# Namespace-qualified tags, formatted once rather than per call
+_INDEX_TAG = f"{{{NAMESPACE}}}sitemapindex"
+_URLSET_TAG = f"{{{NAMESPACE}}}urlset"
+_LOC_TAG = f"{{{NAMESPACE}}}loc"
+
+# lxml reports malformed XML with its own exception type; map it to the
+# stdlib one so callers only ever need to catch ``ET.ParseError``.
+_SYNTAX_ERRORS = (lxml_etree.XMLSyntaxError,) if lxml_etree is not None else ()
+
+
+def _check_root(tag: str) -> None:
+    """Raise ``ET.ParseError`` unless *tag* is a sitemap or sitemap index root.
+
+    Catches e.g. an HTML error page served with ``200 OK``, which would
+    otherwise parse cleanly and silently yield no URLs.
+    """
+    if tag not in (_INDEX_TAG, _URLSET_TAG):
+        raise ET.ParseError(f"not a sitemap: unexpected root element {tag!r}")
+
 
 class SitemapParser:
     """Parses XML content to extract URLs and identify sitemap types."""
@@ -19,9 +55,9 @@ class SitemapParser:
         Returns:
             True if the element is a sitemap index, False otherwise.
         """
-        # Checks if the tag ends with '}sitemapindex', accommodating potential
-        # variations in namespace prefixes.
-        return element.tag.endswith("}sitemapindex")
+        # Tags are in ``{namespace}name`` form whatever prefix the document
+        # uses, so a plain comparison suffices.
+        return element.tag == _INDEX_TAG
 
     def extract_loc_elements(self, element: ET.Element) -> List[str]:
         """Extracts all <loc> text content from a sitemap or sitemap index element.
@@ -30,9 +66,102 @@ class SitemapParser:
             element: The root XML element (sitemap or sitemapindex).
 
         Returns:
-            A list of URLs found within <loc> tags.
+            A list of URLs found within <loc> tags, with surrounding
+            whitespace stripped.
+        """
+        if _LOC_XPATH is not None and isinstance(element, lxml_etree._Element):
+            # The XPath predicate drops empty and whitespace-only <loc>
+            # elements without a Python-level filter.
+            return [text.strip() for text in _LOC_XPATH(element)]
+
+        # ``iter`` walks the tree in C, without compiling and evaluating an
+        # ElementPath expression as ``findall`` does.
+        # Filters out elements where loc.text is None, empty or only whitespace.
+        texts = (loc.text for loc in element.iter(_LOC_TAG) if loc.text)
+        return [text for text in map(str.strip, texts) if text]
+
+    def iter_locs(self, source: BinaryIO) -> Generator[Tuple[bool, str], None, None]:
+        """Stream ``(is_index, loc)`` pairs from a binary file-like *source*.
+
+        Unlike :meth:`extract_loc_elements` the document is never held in
+        memory as a whole: each top-level ``<url>``/``<sitemap>`` entry is
+        discarded as soon as it has been read, so memory stays flat however
+        large the sitemap is. Callers may stop iterating early (e.g. once a
+        URL limit is reached) without the rest of *source* being read.
+
+        Args:
+            source: A readable binary stream containing sitemap XML.
+
+        Yields:
+            ``(is_index, loc)`` where *is_index* tells whether the document
+            root is a ``<sitemapindex>`` and *loc* is non-blank ``<loc>`` text
+            with surrounding whitespace stripped.
+
+        Raises:
+            ET.ParseError: If the XML is malformed (also for lxml errors) or
+                its root is neither ``<urlset>`` nor ``<sitemapindex>``.
+        """
+        if lxml_etree is not None:
+            try:
+                yield from self._iter_locs_lxml(source)
+            except _SYNTAX_ERRORS as e:
+                raise ET.ParseError(str(e)) from e
+            return
+
+        events = ET.iterparse(source, events=("start", "end"))
+        # The first event is the root's start; an empty document raises
+        # ParseError here rather than ending the loop silently
+        _, root = next(events)
+        _check_root(root.tag)
+        is_index = self.is_sitemap_index(root)
+        depth = 1
+        for event, elem in events:
+            if event == "start":
+                depth += 1
+                continue
+
+            depth -= 1
+            if elem.tag == _LOC_TAG and elem.text:
+                text = elem.text.strip()
+                if text:
+                    yield is_index, text
+            if depth == 1:
+                # Finished a top-level entry: drop it to keep memory flat
+                root.clear()
+
+    def _iter_locs_lxml(
+        self, source: BinaryIO
+    ) -> Generator[Tuple[bool, str], None, None]:
+        """lxml flavour of :meth:`iter_locs`.
+
+        libxml2 filters events down to ``</loc>`` in C, so Python only runs
+        once per entry rather than for every start and end tag.
         """
-        # Uses the defined NAMESPACE to find all 'loc' elements correctly.
-        # Filters out elements where loc.text is None or empty.
-        locations = element.findall(f".//{{{NAMESPACE}}}loc")
-        return [loc.text for loc in locations if loc.text]
+        events = lxml_etree.iterparse(
+            source,
+            events=("end",),
+            tag=_LOC_TAG,
+            resolve_entities=False,
+            no_network=True,
+        )
+        is_index = None
+        for _, elem in events:
+            if is_index is None:
+                root = elem.getroottree().getroot()
+                _check_root(root.tag)
+                is_index = self.is_sitemap_index(root)
+            text = elem.text
+            if text:
+                text = text.strip()
+                if text:
+                    yield is_index, text
+            # Drop the entries already read to keep memory flat; the current
+            # one is left alone as the parser is still inside it
+            entry = elem.getparent()
+            parent = entry.getparent()
+            if parent is not None:
+                while entry.getprevious() is not None:
+                    del parent[0]
+        if is_index is None:
+            # No <loc> at all: the root is only known once parsing is done
+            _check_root(events.root.tag)
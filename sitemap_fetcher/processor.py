@@ -1,19 +1,77 @@
 """Module for processing sitemaps, managing state, and orchestrating fetch/parse."""
 
+import io
 import json
+import logging
+import multiprocessing
+import os
 import signal
 import sys
+import threading
 import time
-from typing import List, Optional, Set
+from collections import deque
+from itertools import islice
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import (
+    Any,
+    BinaryIO,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    cast,
+)
 from dataclasses import dataclass
 import xml.etree.ElementTree as ET
 import requests
 
 # Assuming fetcher and parser are in the same directory or package
-from .fetcher import SitemapFetcher
+from .fetcher import NotModified, SitemapFetcher
 from .parser import SitemapParser
 from .state_manager import StateManager
 
+logger = logging.getLogger(__name__)
+
+
+def _parse_sitemap_bytes(parser: SitemapParser, data: bytes) -> List[Tuple[bool, str]]:
+    """Parses a whole sitemap body into ``(is_index, loc)`` pairs.
+
+    Module-level so it can run in a worker process: only the body bytes and
+    the resulting strings cross the process boundary.
+    """
+    return list(parser.iter_locs(io.BytesIO(data)))
+
+
+# Large write buffer for the output file: URLs arrive in sitemap-sized batches
+_OUTPUT_BUFFER_SIZE = 1 << 20
+# Parse workers are never forked from this threaded process (see run())
+_POOL_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# Streamed <loc> entries are deduplicated this many at a time, under one lock
+_LOC_BATCH_SIZE = 1000
+# Only these <loc> schemes are fetched or reported; anything else is dropped
+_HTTP_SCHEMES = ("http://", "https://")
+
+
+def _is_http_url(loc: str) -> bool:
+    """Tells whether *loc* is an absolute http(s) URL (scheme matched case-insensitively)."""
+    return loc[:8].lower().startswith(_HTTP_SCHEMES)
+
+
+class _ShutdownRequested(Exception):
+    """Raised inside a worker to abandon its sitemap once shutdown is requested."""
+
 
 @dataclass
 class ProcessorConfig:
@@ -24,7 +82,12 @@ class ProcessorConfig:
     state_file: Optional[str] = None
     limit: Optional[int] = None
     resume: bool = False
+    refresh: bool = False  # On resume, re-check every sitemap conditionally
     fetcher_timeout: int = 30
+    fetcher_max_retries: int = 3
+    concurrency: int = 8
+    checkpoint_every: int = 500  # Snapshot state after this many sitemaps
+    parse_processes: int = 0  # >0: parse sitemaps in this many worker processes
 
     def __post_init__(self):
         # Automatically determine state_file if not provided
@@ -39,7 +102,7 @@ class SitemapProcessor:
     components, which enables simpler unit‑testing (you can pass lightweight
     mocks instead of patching at the module level):
 
-    >>> mock_fetcher = Mock(fetch_sitemap=lambda url: xml_root)
+    >>> mock_fetcher = Mock(open_sitemap=lambda url, validators: nullcontext(BytesIO(xml)))
     >>> processor = SitemapProcessor(cfg, fetcher=mock_fetcher)
     """
 
@@ -51,171 +114,627 @@ class SitemapProcessor:
         parser: Optional[SitemapParser] = None,
     ):
         self.config = config
+        # URL limit as a plain int, so limit checks need no ``None`` guard
+        self._limit = config.limit if config.limit is not None else sys.maxsize
 
-        # Use injected dependencies or fall back to concrete implementations
+        # Use injected dependencies or fall back to concrete implementations.
+        # Only a fetcher we created ourselves is closed at the end of run().
+        self._owns_fetcher = fetcher is None
         self.fetcher = (
             fetcher
             if fetcher is not None
-            else SitemapFetcher(timeout=self.config.fetcher_timeout)
+            else SitemapFetcher(
+                timeout=self.config.fetcher_timeout,
+                max_retries=self.config.fetcher_max_retries,
+            )
         )
         self.parser = parser if parser is not None else SitemapParser()
 
         # State variables (kept separate from config)
-        self.sitemap_queue: List[str] = []
+        self.sitemap_queue: Deque[str] = deque()
+        # Sitemaps waiting in the queue *or* currently being fetched, for O(1)
+        # duplicate checks; an entry is dropped once the sitemap is done.
+        self._queued: Set[str] = set()
+        # Sitemaps cut short by the URL limit. An index stops queueing once its
+        # queued children should cover the limit, so it is read again after
+        # they are done in case they fall short; they stay in ``_queued``.
+        self._deferred: List[str] = []
+        # Sitemaps that failed this run, so a re-read index skips them
+        self._failed: Set[str] = set()
         self.processed_sitemaps: Set[str] = set()
         self.found_urls: Set[str] = set()
-        self._processing_active = False  # Internal flag for signal handler
+        # ETag/Last-Modified per fetched sitemap, for conditional re-fetches
+        self.sitemap_meta: Dict[str, Dict[str, str]] = {}
+        # Sub-sitemaps listed by each fully read index; an index answering
+        # ``304 Not Modified`` on --refresh still has its children re-checked
+        self.sitemap_children: Dict[str, List[str]] = {}
+        self._processing_active = False  # run() is draining the queue
+        # Set once --limit is met; no further sitemaps are started
+        self._limit_reached = False
+        # Set by the signal handler; workers stop and state is saved by run()
+        self._shutdown = threading.Event()
+        self._output: Optional[TextIO] = None  # URLs are streamed here
+        self._parse_pool: Optional[ProcessPoolExecutor] = None  # See run()
+        # Append-only record of each finished sitemap between snapshots
+        self._journal: Optional[BinaryIO] = None
+        # Journal lines written since the snapshot being saved was taken; they
+        # are all the journal has to keep once that snapshot is on disk
+        self._journal_tail: Optional[List[bytes]] = None
+        self._journal_replayed = 0  # Entries applied on resume, see _load_state
+        # Guards the state above; sitemaps are processed on worker threads.
+        # Re-entrant so the signal handler can save state from any context.
+        self._lock = threading.RLock()
 
     # --- State Management ---
+    def _set_queue(self, urls: Iterable[str]):
+        """Replaces the sitemap queue (and its membership set) with *urls*."""
+        self.sitemap_queue = deque(urls)
+        self._queued = set(self.sitemap_queue)
+
+    def _enqueue(self, url: str) -> bool:
+        """Queues *url* unless it is already queued, in flight, processed or failed."""
+        if url in self._queued or url in self.processed_sitemaps or url in self._failed:
+            return False
+        self.sitemap_queue.append(url)
+        self._queued.add(url)
+        return True
+
     def _save_state(self):
-        """Saves the current processing state to the state file."""
-        state = {
-            "sitemap_queue": self.sitemap_queue,
-            "processed_sitemaps": list(self.processed_sitemaps),
-            "found_urls": list(self.found_urls),
-        }
+        """Saves a full snapshot of the processing state to the state file.
+
+        The output file is flushed first so it is as complete as the saved
+        state allows; URLs of sitemaps still in flight may only be written
+        once their sitemap finishes, but a resumed run rewrites the output
+        from ``found_urls`` anyway. Once the snapshot is on disk the journal
+        is cut back to the entries recorded after it was taken.
+        """
+        with self._lock:
+            self._flush_output()
+            # Sitemaps still in flight are saved at the front of the queue so
+            # an interrupted run fetches them again on resume
+            in_flight = self._queued.difference(self.sitemap_queue)
+            state = {
+                "sitemap_queue": [*in_flight, *self.sitemap_queue],
+                "processed_sitemaps": list(self.processed_sitemaps),
+                "found_urls": list(self.found_urls),
+                "sitemap_meta": dict(self.sitemap_meta),
+                "sitemap_children": dict(self.sitemap_children),
+            }
+            if self._journal is not None:
+                self._journal_tail = []
         try:
             StateManager.save_state(self.config.state_file, state)
-            print(f"Saved state to {self.config.state_file}")
+            logger.info("Saved state to %s", self.config.state_file)
         except IOError as e:
-            print(
-                f"Error saving state file {self.config.state_file}: {e}",
-                file=sys.stderr,
-            )
+            logger.error("Error saving state file %s: %s", self.config.state_file, e)
+            with self._lock:
+                self._journal_tail = None  # Keep the whole journal
+            return
+        with self._lock:
+            self._compact_journal()
+
+    # --- Journal ---
+    @property
+    def _journal_path(self) -> str:
+        """Path of the journal kept next to the state file."""
+        # Always set: ProcessorConfig.__post_init__ derives a default
+        return StateManager.journal_path(cast(str, self.config.state_file))
+
+    def _open_journal(self):
+        """Opens the journal for appending, keeping only what resume needs.
+
+        Entries replayed on resume are only safe to drop once a snapshot holds
+        them, so in that case a snapshot is saved straight away; otherwise any
+        journal left by an earlier run is discarded.
+        """
+        path = self._journal_path
+        try:
+            self._journal = open(path, "ab" if self._journal_replayed else "wb")
+        except IOError as e:
+            self._report_journal_error(e)
+            return
+        if self._journal_replayed:
+            self._save_state()
+
+    def _record_sitemap(
+        self,
+        sitemap_url: str,
+        new_urls: List[str],
+        children: List[str],
+        validators: Dict[str, str],
+    ):
+        """Journals a finished sitemap's changes to the state (caller holds the lock)."""
+        if self._journal is None:
+            return
+        entry: Dict[str, Any] = {
+            "sitemap": sitemap_url,
+            "new_urls": new_urls,
+            "children": children,
+        }
+        if validators:
+            entry["meta"] = validators
+        line = StateManager.encode_journal_entry(entry)
+        try:
+            self._journal.write(line)
+        except IOError as e:
+            self._report_journal_error(e)
+            return
+        if self._journal_tail is not None:
+            self._journal_tail.append(line)
+
+    def _compact_journal(self):
+        """Cuts the journal back to the lines after the latest snapshot (caller holds the lock)."""
+        tail, self._journal_tail = self._journal_tail, None
+        if self._journal is None or tail is None:
+            return
+        path = self._journal_path
+        try:
+            self._journal.close()
+            StateManager.rewrite_journal(path, tail)
+            self._journal = open(path, "ab")
+        except IOError as e:
+            self._report_journal_error(e)
+
+    def _close_journal(self):
+        """Flushes the journal to disk and closes it, if it is open."""
+        with self._lock:
+            if self._journal is None:
+                return
+            try:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+            except IOError as e:
+                self._report_journal_error(e)
+            self._journal = None
+
+    def _report_journal_error(self, error: OSError):
+        """Reports a journal failure; progress is then kept by snapshots only."""
+        logger.error(
+            "Error writing state journal %s: %s",
+            self._journal_path,
+            error,
+        )
+        self._journal = None
+
+    def _start_fresh(self):
+        """Drops any state loaded so far and queues just the root sitemap."""
+        self.processed_sitemaps = set()
+        self.found_urls = set()
+        self.sitemap_meta = {}
+        self.sitemap_children = {}
+        self._journal_replayed = 0  # A stale journal is discarded on open
+        self._set_queue([self.config.sitemap_url])
 
     def _load_state(self):
         """Loads state from the state file."""
         if not self.config.resume:
-            print("Resume flag not set, starting fresh.")
+            logger.info("Resume flag not set, starting fresh.")
             # Initialize queue with root URL only if not resuming
-            self.sitemap_queue = [self.config.sitemap_url]
+            self._set_queue([self.config.sitemap_url])
             return
 
+        loaded = True
         try:
             state = StateManager.load_state(self.config.state_file)
-
-            # Assign validated state
-            self.sitemap_queue = state["sitemap_queue"]
-            self.processed_sitemaps = set(state["processed_sitemaps"])
-            self.found_urls = set(state["found_urls"])
-
-            print(f"Resumed state from {self.config.state_file}:")
-            print(f"  Queue size: {len(self.sitemap_queue)}")
-            print(f"  Processed sitemaps: {len(self.processed_sitemaps)}")
-            print(f"  Found URLs: {len(self.found_urls)}")
-
-            # If queue is empty after loading, likely means previous run completed
-            # or initial state was empty. Re-initialize with root if needed.
-            if not self.sitemap_queue:
-                print("State file queue empty, initializing with root sitemap URL.")
-                self.sitemap_queue = [self.config.sitemap_url]
-
         except FileNotFoundError:
-            # This case should theoretically be caught by os.path.exists, but added for robustness
-            print(f"State file not found at {self.config.state_file}, starting fresh.")
-            self.sitemap_queue = [self.config.sitemap_url]  # Initialize queue
-            return  # Exit method
+            loaded = False
+            # No existence check beforehand: a missing file is the usual first
+            # run. A crash before the first snapshot leaves only the journal,
+            # which is then replayed on top of the root sitemap below.
+            logger.info(
+                "State file not found at %s, starting fresh.", self.config.state_file
+            )
+            state = {
+                "sitemap_queue": [self.config.sitemap_url],
+                "processed_sitemaps": [],
+                "found_urls": [],
+            }
         except json.JSONDecodeError as e:
-            print(f"Error loading or decoding state file {self.config.state_file}: {e}")
-            print("Starting fresh.")
-            self.sitemap_queue = [self.config.sitemap_url]  # Initialize queue
+            logger.warning(
+                "Error loading or decoding state file %s: %s", self.config.state_file, e
+            )
+            logger.info("Starting fresh.")
+            self._start_fresh()
             return  # Exit method
         except (KeyError, ValueError) as e:
-            print(
-                f"Error loading state from {self.config.state_file}: Invalid state data format: {e}"
+            logger.warning(
+                "Error loading state from %s: Invalid state data format: %s",
+                self.config.state_file,
+                e,
             )
-            print("Starting fresh.")
-            self.sitemap_queue = [self.config.sitemap_url]  # Initialize queue
+            logger.info("Starting fresh.")
+            self._start_fresh()
             return  # Exit method
         except IOError as e:
-            print(f"Error reading state file {self.config.state_file}: {e}")
-            print("Starting fresh.")
-            self.sitemap_queue = [self.config.sitemap_url]  # Initialize queue
+            logger.warning("Error reading state file %s: %s", self.config.state_file, e)
+            logger.info("Starting fresh.")
+            self._start_fresh()
             return  # Exit method
 
+        # Assign validated state, popping each list so it can be freed as
+        # soon as its set is built rather than all living until return
+        self._set_queue(state.pop("sitemap_queue"))
+        self.processed_sitemaps = set(state.pop("processed_sitemaps"))
+        self.found_urls = set(state.pop("found_urls"))
+        self.sitemap_meta = state.pop("sitemap_meta", {})
+        self.sitemap_children = state.pop("sitemap_children", {})
+        self._replay_journal()
+
+        if loaded or self._journal_replayed:
+            logger.info("Resumed state from %s:", self.config.state_file)
+            logger.info("  Queue size: %d", len(self.sitemap_queue))
+            logger.info("  Processed sitemaps: %d", len(self.processed_sitemaps))
+            logger.info("  Found URLs: %d", len(self.found_urls))
+
+        if self.config.refresh:
+            # Walk the whole tree again; sitemaps that are unchanged since
+            # their recorded ETag/Last-Modified cost only a 304 response
+            logger.info("Refreshing: re-checking all sitemaps from the root.")
+            self.processed_sitemaps = set()
+            self._set_queue([self.config.sitemap_url])
+
+        # If queue is empty after loading, likely means previous run completed
+        # or initial state was empty. Re-initialize with root if needed.
+        elif not self.sitemap_queue:
+            logger.info("State file queue empty, initializing with root sitemap URL.")
+            self._set_queue([self.config.sitemap_url])
+
+    def _replay_journal(self):
+        """Applies journal entries recorded after the loaded snapshot."""
+        path = self._journal_path
+        for entry in StateManager.read_journal(path):
+            self.processed_sitemaps.add(entry["sitemap"])
+            self.found_urls.update(entry["new_urls"])
+            if entry["children"]:
+                self.sitemap_children[entry["sitemap"]] = entry["children"]
+            # Already processed children are skipped, as when first queued
+            for child in entry["children"]:
+                self._enqueue(child)
+            if "meta" in entry:
+                self.sitemap_meta[entry["sitemap"]] = entry["meta"]
+            self._journal_replayed += 1
+        if self._journal_replayed:
+            # Sitemaps finished after the snapshot leave the queue
+            self._set_queue(
+                url for url in self.sitemap_queue if url not in self.processed_sitemaps
+            )
+            logger.info(
+                "Replayed %d journal entries from %s", self._journal_replayed, path
+            )
+
     # --- Signal Handling ---
     def _signal_handler(self, sig, frame):
-        """Handles termination signals for graceful shutdown."""
-        print(f"\nSignal {sig} received. Shutting down gracefully...")
-        if self._processing_active:
-            print(f"\nSignal {sig} received. Saving state...")
-            self._save_state()
-            self._processing_active = False  # Prevent further processing
+        """Handles termination signals for graceful shutdown.
+
+        The handler only sets a flag: workers abandon their sitemaps (which
+        are put back on the queue), and run() saves state once they have all
+        returned, so the save never races with in-flight writes. A second
+        signal, or one outside the processing phase, exits immediately.
+        """
+        logger.warning("Signal %s received. Shutting down gracefully...", sig)
+        # Reaching the URL limit only sets ``_limit_reached``, so a first
+        # signal after it, with sitemaps still in flight, still saves state
+        if self._processing_active and not self._shutdown.is_set():
+            logger.warning(
+                "Signal %s received. Stopping workers and saving state...", sig
+            )
+            self._shutdown.set()  # Also prevents further submissions
         else:
-            print(f"\nSignal {sig} received during shutdown. Exiting immediately.")
-        sys.exit(0)
+            logger.warning(
+                "Signal %s received during shutdown. Exiting immediately.", sig
+            )
+            sys.exit(0)
 
     # --- Output ---
-    def _write_urls_to_output(self):
-        """Writes the found URLs to the output file."""
+    def _open_output(self):
+        """Opens the output file so URLs can be written as they are found.
+
+        URLs restored from a state file are written first: the previous run
+        may have written URLs past its last checkpoint, so appending to its
+        output could duplicate them.
+        """
         try:
-            with open(self.config.output_file, "w", encoding="utf-8") as f:
-                for url in sorted(list(self.found_urls)):
-                    f.write(url + "\n")
-            print(f"Wrote {len(self.found_urls)} URLs to {self.config.output_file}")
-        except IOError as e:
-            print(
-                f"Error writing to output file {self.config.output_file}: {e}",
-                file=sys.stderr,
+            self._output = open(
+                self.config.output_file,
+                "w",
+                encoding="utf-8",
+                buffering=_OUTPUT_BUFFER_SIZE,
             )
+            self._output.writelines(url + "\n" for url in self.found_urls)
+        except IOError as e:
+            self._report_output_error(e)
 
-    # --- Core Processing Logic ---
-    def _handle_sitemap_index(self, root: ET.Element):
-        """Adds sub-sitemaps found in a sitemap index to the queue."""
-        print("  Sitemap index detected. Extracting sub-sitemaps...")
-        loc_elements = self.parser.extract_loc_elements(root)
-        new_sitemaps = 0
-        for loc in loc_elements:
-            # Add only if not already processed and not already in queue
-            if loc not in self.processed_sitemaps and loc not in self.sitemap_queue:
-                self.sitemap_queue.append(loc)
-                new_sitemaps += 1
-        print(f"  Added {new_sitemaps} new sitemaps to the queue.")
-
-    def _handle_regular_sitemap(self, root: ET.Element):
-        """Extracts URLs from a regular sitemap file, respecting limits."""
-        print("  Regular sitemap detected. Extracting URLs...")
-        loc_elements = self.parser.extract_loc_elements(root)
-        new_urls = 0
-        for loc in loc_elements:
-            # Check limit before adding each URL
-            if (
-                self.config.limit is not None
-                and len(self.found_urls) >= self.config.limit
-            ):
-                print(
-                    f"  URL limit ({self.config.limit}) reached during URL extraction."
+    def _write_urls(self, urls: List[str]):
+        """Appends newly found URLs to the output file (caller holds the lock).
+
+        A single write per batch keeps per-URL work out of the hot loop.
+        """
+        if self._output is None:
+            return
+        try:
+            self._output.write("\n".join(urls) + "\n")
+        except IOError as e:
+            self._report_output_error(e)
+
+    def _flush_output(self):
+        """Pushes buffered URLs to the output file (caller holds the lock)."""
+        if self._output is None:
+            return
+        try:
+            self._output.flush()
+        except IOError as e:
+            self._report_output_error(e)
+
+    def _close_output(self):
+        """Flushes and closes the output file, if it is open."""
+        with self._lock:
+            if self._output is None:
+                return
+            try:
+                self._output.close()
+                logger.info(
+                    "Wrote %d URLs to %s", len(self.found_urls), self.config.output_file
                 )
-                self._processing_active = False  # Signal outer loop to stop
-                break  # Exit inner URL loop
+            except IOError as e:
+                self._report_output_error(e)
+            self._output = None
+
+    def _report_output_error(self, error: OSError):
+        """Reports an output failure and stops further writes to the file."""
+        logger.error(
+            "Error writing to output file %s: %s", self.config.output_file, error
+        )
+        self._output = None
 
-            if loc not in self.found_urls:
-                self.found_urls.add(loc)
-                new_urls += 1
-        print(f"  Found {new_urls} new URLs.")
+    # --- Core Processing Logic ---
+    def _consume_locs(
+        self, locs: Iterable[Tuple[bool, str]]
+    ) -> Tuple[List[str], List[str], bool]:
+        """Routes streamed ``(is_index, loc)`` pairs into the queue or URL set.
+
+        Returns the new page URLs and the sub-sitemaps listed by an index, for
+        the journal, and whether the sitemap was read in full.
+
+        Sub-sitemaps from a sitemap index are queued; page URLs from a regular
+        sitemap are recorded until the URL limit is hit. Either way the stream
+        is abandoned as soon as the limit makes further entries pointless, so
+        the rest of the document is never read. Entries that are not http(s)
+        URLs are skipped.
+        """
+        is_index = None
+        added = 0
+        # Page URLs are written to the output file in one go per sitemap
+        new_urls: List[str] = []
+        children: List[str] = []
+        complete = True
+        pairs = iter(locs)
+        try:
+            while True:
+                batch = list(islice(pairs, self._batch_size()))
+                if not batch:
+                    break
+                if self._shutdown.is_set():
+                    raise _ShutdownRequested
+                is_index = batch[0][0]
+                # Drop ftp:, mailto:, javascript: and relative <loc> values
+                batch = [pair for pair in batch if _is_http_url(pair[1])]
+                if not batch:
+                    continue
+                with self._lock:
+                    if is_index:
+                        stop, count = self._enqueue_batch(batch, children)
+                    else:
+                        stop, count = self._add_urls(batch, new_urls)
+                added += count
+                if stop:
+                    complete = False
+                    break  # Stop reading this sitemap
+        finally:
+            if new_urls:
+                with self._lock:
+                    self._write_urls(new_urls)
+
+        if is_index:
+            logger.info("  Sitemap index: added %d new sitemaps to the queue.", added)
+        else:
+            logger.info("  Found %d new URLs.", added)
+        return new_urls, children, complete
+
+    def _batch_size(self) -> int:
+        """How many streamed entries to take at once, without overshooting the limit."""
+        return max(1, min(_LOC_BATCH_SIZE, self._limit - len(self.found_urls)))
+
+    def _enqueue_batch(
+        self, batch: List[Tuple[bool, str]], children: List[str]
+    ) -> Tuple[bool, int]:
+        """Queues sub-sitemaps from an index (caller holds the lock).
+
+        Every sub-sitemap read is appended to *children*. Returns whether to
+        stop reading the index and how many were queued.
+        """
+        count = 0
+        for _, loc in batch:
+            # Stop queueing once the queued sitemaps would cover the limit
+            # with one URL each; if they fall short (404s, duplicates) the
+            # index is read again once they are done
+            if len(self.found_urls) + len(self.sitemap_queue) >= self._limit:
+                logger.info("  URL limit (%d) covered by queued sitemaps.", self._limit)
+                return True, count
+
+            children.append(loc)
+            # Add only if not already processed and not already in queue
+            if self._enqueue(loc):
+                count += 1
+        return False, count
+
+    def _add_urls(
+        self, batch: List[Tuple[bool, str]], new_urls: List[str]
+    ) -> Tuple[bool, int]:
+        """Records unseen page URLs from a batch (caller holds the lock).
+
+        Returns whether the URL limit was reached and how many were added.
+        """
+        # Dedupe the batch in C (dict keeps first-seen order), then test each
+        # survivor against ``found_urls`` once and add them all in one update
+        fresh = [
+            loc
+            for loc in dict.fromkeys(loc for _, loc in batch)
+            if loc not in self.found_urls
+        ]
+        stop = False
+        room = self._limit - len(self.found_urls)
+        if room <= 0 or len(fresh) > room:
+            logger.info("  URL limit (%d) reached during URL extraction.", self._limit)
+            self._limit_reached = True  # Signal outer loop to stop
+            fresh = fresh[: max(room, 0)]
+            stop = True
+        self.found_urls.update(fresh)
+        new_urls.extend(fresh)
+        return stop, len(fresh)
 
     def _process_single_sitemap(self, sitemap_url: str):
-        """Fetches, parses, and processes a single sitemap URL."""
-        # Skip if already processed
-        if sitemap_url in self.processed_sitemaps:
-            print(f"Skipping already processed sitemap: {sitemap_url}")
-            return
+        """Fetches, parses, and processes a single sitemap URL.
 
-        print(f"Processing sitemap: {sitemap_url}")
+        Runs on a worker thread: the body is streamed and parsed without
+        holding the lock, so several sitemaps can be downloaded at once, while
+        updates to the shared queue and URL sets are serialised.
+        """
+        # Skip if already processed
+        with self._lock:
+            if sitemap_url in self.processed_sitemaps:
+                logger.debug("Skipping already processed sitemap: %s", sitemap_url)
+                self._queued.discard(sitemap_url)
+                return
+            # Copied: the fetcher updates it in place with the new validators
+            validators = dict(self.sitemap_meta.get(sitemap_url, {}))
+
+        logger.info("Processing sitemap: %s", sitemap_url)
+        requeue = defer = False
         try:
-            root = self.fetcher.fetch_sitemap(sitemap_url)
-            self.processed_sitemaps.add(sitemap_url)
+            try:
+                with self.fetcher.open_sitemap(sitemap_url, validators) as stream:
+                    pool = self._parse_pool
+                    if pool is not None:
+                        changes = self._consume_locs(self._parse_in_pool(pool, stream))
+                    else:
+                        locs = self.parser.iter_locs(stream)
+                        try:
+                            changes = self._consume_locs(locs)
+                        finally:
+                            locs.close()
+            except NotModified:
+                logger.info("  Not modified since the last fetch.")
+                # The children of an unchanged index may have changed
+                # themselves, so they are queued to be re-checked as well
+                with self._lock:
+                    known = self.sitemap_children.get(sitemap_url, [])
+                changes = (
+                    self._consume_locs((True, child) for child in known)
+                    if known
+                    else ([], [], True)
+                )
 
-            if self.parser.is_sitemap_index(root):
-                self._handle_sitemap_index(root)
+            new_urls, children, complete = changes
+            if complete:
+                with self._lock:
+                    self.processed_sitemaps.add(sitemap_url)
+                    if validators:
+                        self.sitemap_meta[sitemap_url] = validators
+                    if children:
+                        self.sitemap_children[sitemap_url] = children
+                    else:
+                        self.sitemap_children.pop(sitemap_url, None)
+                    self._record_sitemap(sitemap_url, new_urls, children, validators)
             else:
-                self._handle_regular_sitemap(root)
+                # Cut short by the URL limit: not done, so it is read again
+                # later in this run or by a resumed one (see _drain_queue)
+                defer = True
 
+        except _ShutdownRequested:
+            requeue = True  # Unfinished: fetch it again on resume
         except requests.exceptions.RequestException:
-            print(f"Failed to fetch {sitemap_url}. Skipping.", file=sys.stderr)
-            # Optionally add retry logic here
-        except ET.ParseError:
-            print(f"Failed to parse {sitemap_url}. Skipping.", file=sys.stderr)
+            # Transient failures were already retried with back-off by the
+            # fetcher's transport adapter
+            logger.error("Failed to fetch %s. Skipping.", sitemap_url)
+            with self._lock:
+                self._failed.add(sitemap_url)
+        except ET.ParseError as e:
+            logger.error("Error parsing XML from %s: %s", sitemap_url, e)
+            logger.error("Failed to parse %s. Skipping.", sitemap_url)
+            with self._lock:
+                self._failed.add(sitemap_url)
+        finally:
+            with self._lock:
+                if requeue:
+                    self.sitemap_queue.appendleft(sitemap_url)  # Still _queued
+                elif defer:
+                    self._deferred.append(sitemap_url)  # Still _queued
+                else:
+                    self._queued.discard(sitemap_url)  # No longer in flight
+
+    def _parse_in_pool(
+        self, pool: ProcessPoolExecutor, stream: BinaryIO
+    ) -> List[Tuple[bool, str]]:
+        """Downloads a sitemap body on this thread and parses it on another core.
+
+        The whole body is read first, so unlike streaming this cannot stop
+        downloading early at the URL limit; it pays off for large sitemaps
+        where parsing, not the network, is the bottleneck.
+        """
+        data = stream.read()
+        future = pool.submit(_parse_sitemap_bytes, self.parser, data)
+        return future.result()
+
+    def _stopping(self) -> bool:
+        """Tells whether no more sitemaps should be started (limit or signal)."""
+        return self._limit_reached or self._shutdown.is_set()
+
+    def _drain_queue(self):
+        """Processes queued sitemaps on a thread pool until done or stopped."""
+        pending: Set[Future] = set()
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.config.concurrency) as executor:
+            while True:
+                # Keep up to ``concurrency`` sitemaps in flight at once
+                with self._lock:
+                    while (
+                        self.sitemap_queue
+                        and not self._stopping()
+                        and len(pending) < self.config.concurrency
+                    ):
+                        # Check URL limit before processing next sitemap
+                        if len(self.found_urls) >= self._limit:
+                            logger.info(
+                                "URL limit (%d) reached. Stopping.", self._limit
+                            )
+                            self._limit_reached = True
+                            break
+
+                        # Stays in ``_queued`` until processed (see _enqueue)
+                        current_sitemap_url = self.sitemap_queue.popleft()
+                        pending.add(
+                            executor.submit(
+                                self._process_single_sitemap, current_sitemap_url
+                            )
+                        )
+
+                if not pending:
+                    with self._lock:
+                        if not self._deferred or self._stopping():
+                            break  # Queue drained (or stopped), nothing in flight
+                        # Children queued by cut-short indexes are all done but
+                        # fell short of the limit: read the indexes again
+                        self.sitemap_queue.extend(self._deferred)
+                        self._deferred.clear()
+                    continue
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()  # Re-raise unexpected worker errors
+                    completed += 1
+                    if completed % self.config.checkpoint_every == 0:
+                        self._save_state()  # Periodic checkpoint
 
     def run(self):
         """Starts the sitemap processing workflow."""
@@ -226,29 +745,41 @@ class SitemapProcessor:
         self._load_state()  # Load state or initialize queue
 
         if not self.sitemap_queue:
-            print("Initial sitemap queue is empty. Nothing to process.")
+            logger.info("Initial sitemap queue is empty. Nothing to process.")
             return
 
         self._processing_active = True
-        print("Starting sitemap processing...")
-
-        while self.sitemap_queue and self._processing_active:
-            # Check URL limit before processing next sitemap
-            if (
-                self.config.limit is not None
-                and len(self.found_urls) >= self.config.limit
-            ):
-                print(f"\nURL limit ({self.config.limit}) reached. Stopping.")
-                break
-
-            current_sitemap_url = self.sitemap_queue.pop(0)
-            self._process_single_sitemap(current_sitemap_url)
-
-        # --- Post-processing ---
-        self._processing_active = False  # Ensure flag is false after loop finishes
-        total_time = time.time() - start_time
-        print(f"\nFinished processing in {total_time:.2f} seconds.")
-
-        # Final save and write, regardless of whether loop completed naturally or stopped early
-        self._save_state()  # Re-add state saving for normal completion
-        self._write_urls_to_output()
+        logger.info("Starting sitemap processing...")
+
+        if self.config.parse_processes > 0:
+            # Workers start on demand from fetch threads, and forking a
+            # process while other threads hold locks can deadlock the child
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.config.parse_processes,
+                mp_context=multiprocessing.get_context(_POOL_START_METHOD),
+            )
+        self._open_output()
+        self._open_journal()
+        try:
+            self._drain_queue()
+
+            # --- Post-processing ---
+            self._processing_active = False  # Ensure flag is false after loop
+            total_time = time.time() - start_time
+            if self._shutdown.is_set():
+                logger.info(
+                    "Stopped after %.2f seconds; resume with --resume.", total_time
+                )
+            else:
+                logger.info("Finished processing in %.2f seconds.", total_time)
+
+            # Final save, whether the loop completed naturally or stopped early
+            self._save_state()
+        finally:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+            if self._owns_fetcher:
+                self.fetcher.close()  # Release pooled keep-alive connections
+            self._close_output()
+            self._close_journal()
@@ -3,12 +3,89 @@
 Separated from ``processor.py`` to reduce the responsibilities of
 ``SitemapProcessor`` and make state‑file logic easier to unit‑test in
 isolation.
+
+State files are encoded with `orjson <https://github.com/ijl/orjson>`_ when it
+is installed (several times faster than the stdlib for large URL lists) and
+with the stdlib ``json`` module otherwise; both produce the same plain JSON.
+
+Between full snapshots, progress is recorded in an append‑only *journal*
+next to the state file: one JSON line per finished sitemap holding only what
+that sitemap changed, so the cost of a step is proportional to its delta
+rather than to the whole state.
 """
 
 from __future__ import annotations
 
 import json
-from typing import Dict, List
+import os
+import tempfile
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed‑up
+    orjson = None  # type: ignore[assignment]
+
+
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def _dump(obj: Any, fp: BinaryIO) -> None:
+    """Write *obj* to the binary file *fp* as compact UTF‑8 JSON.
+
+    The stdlib fallback encodes in chunks straight into *fp* instead of
+    building the whole document as a ``str`` and then again as ``bytes``,
+    which for millions of URLs would briefly hold two full copies.
+    """
+    if orjson is not None:
+        fp.write(orjson.dumps(obj))
+        return
+    for chunk in _ENCODER.iterencode(obj):
+        fp.write(chunk.encode("utf-8"))
+
+
+def _dumps(obj: Any) -> bytes:
+    """Encode a small *obj* as compact UTF‑8 JSON in one go."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _ENCODER.encode(obj).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    """Decode JSON *data*; errors subclass ``json.JSONDecodeError`` either way."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _is_journal_entry(entry: Any) -> bool:
+    """Tell whether a decoded journal line has the shape replay relies on."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("sitemap"), str)
+        and isinstance(entry.get("new_urls"), list)
+        and isinstance(entry.get("children"), list)
+        and isinstance(entry.get("meta", {}), dict)
+    )
+
+
+def _atomic_write(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """Write *path* via *write* on a temporary file, then move it into place.
+
+    An interrupted write can never leave a truncated file behind: the temp
+    file lives in the same directory and replaces *path* with ``os.replace``.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            write(fp)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 class StateManager:
@@ -20,6 +97,11 @@ class StateManager:
         "processed_sitemaps": list,
         "found_urls": list,
     }
+    # Keys that older state files may lack.
+    OPTIONAL_KEYS = {
+        "sitemap_meta": dict,
+        "sitemap_children": dict,
+    }
 
     @classmethod
     def load_state(cls, path: str) -> Dict[str, List[str]]:
@@ -38,14 +120,16 @@ class StateManager:
         IOError
             For general I/O errors while reading the file.
         """
-        with open(path, "r", encoding="utf-8") as fp:
-            state = json.load(fp)
+        with open(path, "rb") as fp:
+            state = _loads(fp.read())
 
         if not isinstance(state, dict):
             raise ValueError("State data is not a dictionary")
 
-        for key, expected_type in cls.REQUIRED_KEYS.items():
+        for key, expected_type in {**cls.REQUIRED_KEYS, **cls.OPTIONAL_KEYS}.items():
             if key not in state:
+                if key in cls.OPTIONAL_KEYS:
+                    continue
                 raise KeyError(f"Missing required key in state: {key}")
             if not isinstance(state[key], expected_type):
                 expected = expected_type.__name__
@@ -59,10 +143,47 @@ class StateManager:
     def save_state(path: str, state: Dict[str, List[str]]) -> None:
         """Persist *state* atomically to *path*.
 
-        The write is done in a plain ``open(..., 'w')`` call which is
-        sufficient for the symmetry with the existing implementation. If
-        atomic writes are needed, a temporary file & ``os.replace`` could be
-        used.
+        The JSON is written to a temporary file in the same directory and then
+        moved over *path* with ``os.replace``, so an interrupted write can never
+        leave a truncated state file behind. The output is compact (no
+        indentation) since state files can hold millions of URLs.
+        """
+        _atomic_write(path, lambda fp: _dump(state, fp))
+
+    # --- Journal ---
+    @staticmethod
+    def journal_path(path: str) -> str:
+        """Return the path of the journal that accompanies state file *path*."""
+        return f"{path}.log"
+
+    @staticmethod
+    def encode_journal_entry(entry: Dict[str, Any]) -> bytes:
+        """Encode *entry* as one journal line."""
+        return _dumps(entry) + b"\n"
+
+    @staticmethod
+    def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+        """Yield the entries of the journal at *path*, if it exists.
+
+        Reading stops at the first line that is not a well-formed entry: a
+        crash can leave the last line half-written, and nothing after it can
+        be trusted.
         """
-        with open(path, "w", encoding="utf-8") as fp:
-            json.dump(state, fp, indent=4)
+        try:
+            fp = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with fp:
+            for line in fp:
+                try:
+                    entry = _loads(line)
+                except ValueError:  # Also covers a torn multi-byte character
+                    break
+                if not _is_journal_entry(entry):
+                    break
+                yield entry
+
+    @staticmethod
+    def rewrite_journal(path: str, lines: Iterable[bytes]) -> None:
+        """Atomically replace the journal at *path* with the encoded *lines*."""
+        _atomic_write(path, lambda fp: fp.writelines(lines))
@@ -1,10 +1,12 @@
+import io
 import pytest
 import requests
 import codecs  # Import codecs for BOM
+import gzip
 from sitemap_fetcher.fetcher import SitemapFetcher
 
 
-# Helper class for mocking requests.get
+# Helper class for mocking Session.get responses
 class MockResponse:
     def __init__(self, xml_data, status_code=200, encoding="utf-8"):
         # self.xml_data = xml_data # Store original string if needed elsewhere
@@ -14,13 +16,19 @@ class MockResponse:
             self.content = xml_data.encode(encoding)
         else:  # Assume bytes if not string (e.g., for BOM)
             self.content = xml_data
+        # Streamed body, as read by SitemapFetcher.open_sitemap
+        self.raw = io.BytesIO(self.content)
         self.status_code = status_code
+        self.headers = {}
         self.ok = 200 <= status_code < 300
 
     def raise_for_status(self):
         if not self.ok:
             raise requests.exceptions.HTTPError(f"{self.status_code} Client Error")
 
+    def close(self):
+        self.raw.close()
+
     # Add a way to simulate reading the content as XML element if needed by parser directly
     # Although the fetcher currently uses resp.content directly
     # def xml(self):
@@ -39,89 +47,182 @@ class MockResponse:
 def _disable_throttle(monkeypatch):
     """Monkey‑patch ``SitemapFetcher._throttle`` to a no‑op for speed."""
 
-    monkeypatch.setattr(SitemapFetcher, "_throttle", lambda self: None)
+    monkeypatch.setattr(SitemapFetcher, "_throttle", lambda self, url: None)
 
 
-# Monkeypatch requests.get
-@pytest.fixture
-def patch_requests(monkeypatch):
-    """Patches requests.get to return controlled responses or raise errors."""
+# Fail fast on real HTTP: a test that forgets ``patch_requests`` (or its own
+# Session.get mock) would otherwise hit the network and hang or flake.
+@pytest.fixture(autouse=True)
+def _block_network(monkeypatch):
+    """Make any request that reaches a transport adapter raise immediately."""
+
+    def send(self, request, **kwargs):
+        raise RuntimeError(f"Unmocked network access in test: {request.url}")
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", send)
+
 
-    # Define BOM + XML content
-    bom_xml_content = (
-        codecs.BOM_UTF8
-        + """<?xml version="1.0" encoding="UTF-8"?>
+# Run a test once per XML backend of the parser: lxml (skipped when it is not
+# installed) and the stdlib ElementTree fallback.
+@pytest.fixture(params=["lxml", "stdlib"])
+def xml_backend(request, monkeypatch):
+    """Select the parser's XML backend and return its name."""
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    else:
+        monkeypatch.setattr("sitemap_fetcher.parser.lxml_etree", None)
+        monkeypatch.setattr("sitemap_fetcher.parser._LOC_XPATH", None)
+    return request.param
+
+
+def _canned(body, status_code):
+    """Build a table entry, encoding a ``str`` body once here, not per request."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return body, status_code
+
+
+# Canned sitemap bodies by URL, as ``(body, status_code)``; each request gets
+# a fresh MockResponse so its streamed body can be read again
+_BOM_XML = codecs.BOM_UTF8 + (
+    """<?xml version="1.0" encoding="UTF-8"?>
 <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
    <url><loc>http://bom.com/page1</loc></url>
-</urlset>""".encode(
-            "utf-8"
-        )
-    )
-
-    def fake_get(url, **kwargs):  # Accept **kwargs to handle 'timeout'
-        # Existing error/limit cases
-        if url == "http://error.com/sitemap.xml":
-            raise requests.exceptions.RequestException("Network error")
-        if url == "http://badxml.com/sitemap.xml":
-            # Return genuinely malformed XML to trigger ParseError
-            return MockResponse("<root><unclosed-tag</root>")
-        if url == "http://bom.com/sitemap.xml":  # Test UTF-8 BOM fallback
-            # Return raw bytes including BOM
-            return MockResponse(
-                bom_xml_content, status_code=200, encoding=None
-            )  # Indicate no specific encoding
-        if url == "http://notfound.com/sitemap.xml":  # Test 404
-            return MockResponse("<error>Not Found</error>", status_code=404)
-        if url == "http://limited.com/sitemap.xml":
-            return MockResponse(
-                """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+</urlset>""".encode("utf-8")
+)
+
+_URL_TABLE = {
+    # Genuinely malformed XML to trigger ParseError
+    "http://badxml.com/sitemap.xml": _canned("<root><unclosed-tag</root>", 200),
+    # Raw bytes including a UTF-8 BOM
+    "http://bom.com/sitemap.xml": _canned(_BOM_XML, 200),
+    "http://notfound.com/sitemap.xml": _canned("<error>Not Found</error>", 404),
+    "http://limited.com/sitemap.xml": _canned(
+        """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
                     <url><loc>http://limited.com/page1</loc></url>
                     <url><loc>http://limited.com/page2</loc></url>
                     <url><loc>http://limited.com/page3</loc></url>
-                </urlset>"""
-            )
-        if url == "http://resume.com/index.xml":
-            return MockResponse(
-                """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                </urlset>""",
+        200,
+    ),
+    "http://resume.com/index.xml": _canned(
+        """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
                        <sitemap><loc>http://resume.com/child1.xml</loc></sitemap>
                        <sitemap><loc>http://resume.com/child2.xml</loc></sitemap>
-                   </sitemapindex>"""
-            )
-        if url == "http://resume.com/child1.xml":
-            return MockResponse(
-                """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                   </sitemapindex>""",
+        200,
+    ),
+    "http://resume.com/child1.xml": _canned(
+        """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
                        <url><loc>http://resume.com/pageA</loc></url>
                        <url><loc>http://resume.com/pageB</loc></url>
-                   </urlset>"""
-            )
-        if url == "http://resume.com/child2.xml":
-            return MockResponse(
-                """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                   </urlset>""",
+        200,
+    ),
+    "http://resume.com/child2.xml": _canned(
+        """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
                        <url><loc>http://resume.com/pageC</loc></url>
                        <url><loc>http://resume.com/pageD</loc></url>
-                   </urlset>"""
-            )
-
-        # Default cases for success test
-        if url == "http://example.com/index.xml":
-            return MockResponse(
-                """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                   </urlset>""",
+        200,
+    ),
+    # ``.xml.gz`` files served as-is (no Content-Encoding)
+    "http://gz.com/index.xml.gz": _canned(
+        gzip.compress(
+            b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b"<sitemap><loc>http://gz.com/sitemap.xml.gz</loc></sitemap>"
+            b"</sitemapindex>"
+        ),
+        200,
+    ),
+    "http://gz.com/sitemap.xml.gz": _canned(
+        gzip.compress(
+            b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            b"<url><loc>http://gz.com/page1</loc></url>"
+            b"<url><loc>http://gz.com/page2</loc></url>"
+            b"</urlset>"
+        ),
+        200,
+    ),
+    # Its first child 404s, so the limit is only met by the second one
+    "http://shortfall.com/index.xml": _canned(
+        """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                       <sitemap><loc>http://notfound.com/sitemap.xml</loc></sitemap>
+                       <sitemap><loc>http://limited.com/sitemap.xml</loc></sitemap>
+                   </sitemapindex>""",
+        200,
+    ),
+    # Non-http(s) <loc> values that must never be fetched or reported
+    "http://schemes.com/index.xml": _canned(
+        """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                       <sitemap><loc>ftp://schemes.com/sitemap.xml</loc></sitemap>
+                       <sitemap><loc>HTTP://schemes.com/child.xml</loc></sitemap>
+                   </sitemapindex>""",
+        200,
+    ),
+    "HTTP://schemes.com/child.xml": _canned(
+        """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                       <url><loc>javascript:alert(1)</loc></url>
+                       <url><loc>https://schemes.com/page1</loc></url>
+                       <url><loc>/relative/page2</loc></url>
+                       <url><loc>mailto:webmaster@schemes.com</loc></url>
+                   </urlset>""",
+        200,
+    ),
+    # Index with an XML declaration, pointing at the child below
+    "http://example.com/sitemap.xml": _canned(
+        """<?xml version="1.0" encoding="UTF-8"?>
+    <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+       <sitemap>
+          <loc>http://example.com/child.xml</loc>
+       </sitemap>
+    </sitemapindex>""",
+        200,
+    ),
+    "http://example.com/empty_state.xml": _canned(
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>',
+        200,
+    ),
+    "http://example.com/io_error.xml": _canned(
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        "<url><loc>http://example.com/page1</loc></url>"
+        "</urlset>",
+        200,
+    ),
+    # Default cases for success test
+    "http://example.com/index.xml": _canned(
+        """<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
                        <sitemap><loc>http://example.com/child.xml</loc></sitemap>
-                   </sitemapindex>"""
-            )
-        if url == "http://example.com/child.xml":
-            return MockResponse(
-                """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                   </sitemapindex>""",
+        200,
+    ),
+    "http://example.com/child.xml": _canned(
+        """<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
                        <url><loc>http://example.com/page1</loc></url>
                        <url><loc>http://example.com/page2</loc></url>
-                   </urlset>"""
-            )
+                   </urlset>""",
+        200,
+    ),
+}
+
+
+# Monkeypatch requests.Session.get (SitemapFetcher uses a persistent session)
+@pytest.fixture
+def patch_requests(monkeypatch):
+    """Patches Session.get to return controlled responses or raise errors."""
+
+    def fake_get(url, **kwargs):  # Accept **kwargs to handle 'timeout'
+        if url == "http://error.com/sitemap.xml":
+            raise requests.exceptions.RequestException("Network error")
+        canned = _URL_TABLE.get(url)
+        if canned is not None:
+            body, status_code = canned
+            return MockResponse(body, status_code=status_code)
 
-        # Default fallback for unexpected URLs
         # Keep the original 404 for truly unexpected URLs during testing
         print(f"WARN: Unexpected URL requested in test: {url}")
         return MockResponse("<root/>", status_code=404)
 
-    monkeypatch.setattr(requests, "get", fake_get)
-
-    # No need to patch _throttle here anymore (handled globally)
+    monkeypatch.setattr(
+        requests.Session, "get", lambda self, url, **kwargs: fake_get(url, **kwargs)
+    )
@@ -1,12 +1,18 @@
+import gzip
+import io
 import xml.etree.ElementTree as ET
-from unittest.mock import ANY, patch
+from unittest.mock import patch
 
 import pytest
 import requests
-from sitemap_fetcher.fetcher import SitemapFetcher
+from sitemap_fetcher.fetcher import NotModified, SitemapFetcher
+from sitemap_fetcher.parser import SitemapParser
 
 # Fixtures like patch_requests are automatically discovered from conftest.py
 
+# The real throttle, captured before the autouse fixture replaces it
+_REAL_THROTTLE = SitemapFetcher._throttle  # pylint: disable=protected-access
+
 
 # --- Tests for SitemapFetcher ---
 
@@ -37,9 +43,9 @@ def test_fetcher_fetch_sitemap_bad_xml(patch_requests):
 # --- New Tests ---
 
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_fetcher_timeout(mock_get):
-    """Tests that the fetcher passes the timeout to requests.get."""
+    """Tests that the fetcher passes the timeout to Session.get."""
     # Configure the mock to return a basic valid response
     mock_response = requests.Response()
     mock_response.status_code = 200
@@ -49,16 +55,16 @@ def test_fetcher_timeout(mock_get):
     # Test default timeout
     fetcher_default = SitemapFetcher()
     fetcher_default.fetch_sitemap("http://test.com/sitemap.xml")
-    mock_get.assert_called_with("http://test.com/sitemap.xml", timeout=30, headers=ANY)
+    mock_get.assert_called_with("http://test.com/sitemap.xml", timeout=30, headers=None)
 
     # Test custom timeout
     fetcher_custom = SitemapFetcher(timeout=15)
     fetcher_custom.fetch_sitemap("http://test.com/sitemap.xml")
-    mock_get.assert_called_with("http://test.com/sitemap.xml", timeout=15, headers=ANY)
+    mock_get.assert_called_with("http://test.com/sitemap.xml", timeout=15, headers=None)
 
 
-def test_fetcher_fetch_sitemap_utf8_fallback(patch_requests):
-    """Tests SitemapFetcher handles XML with BOM via UTF-8 fallback."""
+def test_fetcher_fetch_sitemap_utf8_bom(patch_requests):
+    """Tests SitemapFetcher parses XML bytes with a UTF-8 BOM directly."""
     fetcher = SitemapFetcher()
     # This URL is configured in conftest.py to return XML with a BOM
     root = fetcher.fetch_sitemap("http://bom.com/sitemap.xml")
@@ -76,3 +82,158 @@ def test_fetcher_fetch_sitemap_http_error(patch_requests):
     with pytest.raises(requests.exceptions.HTTPError):
         # This URL is configured in conftest.py to return a 404
         fetcher.fetch_sitemap("http://notfound.com/sitemap.xml")
+
+
+def test_fetcher_open_sitemap_streams_body(patch_requests):
+    """Tests open_sitemap yields a readable stream of the response body."""
+    fetcher = SitemapFetcher()
+    with fetcher.open_sitemap("http://example.com/child.xml") as stream:
+        body = stream.read()
+    assert b"<loc>http://example.com/page1</loc>" in body
+
+
+def test_fetcher_open_sitemap_http_error(patch_requests):
+    """Tests open_sitemap raises HTTPError before yielding on a bad status."""
+    fetcher = SitemapFetcher()
+    with pytest.raises(requests.exceptions.HTTPError):
+        with fetcher.open_sitemap("http://notfound.com/sitemap.xml"):
+            pass  # pragma: no cover - never reached
+
+
+def test_fetcher_session_reuse_and_close(mocker):
+    """Tests the fetcher keeps one configured session and closes it on exit."""
+    with SitemapFetcher(user_agent="Test UA") as fetcher:
+        session = fetcher._session  # pylint: disable=protected-access
+        assert session.headers["User-Agent"] == "Test UA"
+        adapter = session.get_adapter("https://example.com/sitemap.xml")
+        assert adapter.max_retries.total == 3
+        mock_close = mocker.patch.object(session, "close")
+    mock_close.assert_called_once_with()
+
+
+def test_fetcher_throttle_is_per_host(monkeypatch, mocker):
+    """Tests requests wait only for earlier requests to the same host."""
+    monkeypatch.setattr(SitemapFetcher, "_last_request_ts", {})
+    mocker.patch("sitemap_fetcher.fetcher.time.monotonic", return_value=100.0)
+    mock_sleep = mocker.patch("sitemap_fetcher.fetcher.time.sleep")
+    fetcher = SitemapFetcher(request_interval=2)
+
+    _REAL_THROTTLE(fetcher, "http://a.com/sitemap.xml")
+    _REAL_THROTTLE(fetcher, "http://b.com/sitemap.xml")
+    mock_sleep.assert_not_called()  # Different hosts do not wait
+
+    _REAL_THROTTLE(fetcher, "http://a.com/child.xml")
+    _REAL_THROTTLE(fetcher, "http://a.com/child2.xml")
+    # Same host: each request takes the next free slot after the last one
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [2.0, 4.0]
+
+
+def test_fetcher_fetch_sitemap_parses_bytes_once(mocker):
+    """Tests a document that fails to parse is not re-decoded and re-parsed."""
+    mock_response = mocker.Mock()
+    mock_response.content = b"<urlset><url><loc>http://a.com/</loc></url>"
+    mock_response.raise_for_status.return_value = None
+    mocker.patch("requests.Session.get", return_value=mock_response)
+    spy = mocker.patch(
+        "sitemap_fetcher.fetcher.ET.fromstring", side_effect=ET.ParseError("bad")
+    )
+    mocker.patch("sitemap_fetcher.fetcher.lxml_etree", None)
+
+    with pytest.raises(ET.ParseError):
+        SitemapFetcher().fetch_sitemap("http://a.com/sitemap.xml")
+    spy.assert_called_once_with(mock_response.content)
+
+
+GZ_SITEMAP = gzip.compress(
+    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    b"<url><loc>http://example.com/gz-page</loc></url></urlset>"
+)
+
+
+def _mock_gz_response(mocker, content):
+    mock_response = mocker.Mock()
+    mock_response.content = content
+    mock_response.raw = io.BytesIO(content)
+    mock_response.raise_for_status.return_value = None
+    return mocker.patch("requests.Session.get", return_value=mock_response)
+
+
+def test_fetcher_gzipped_sitemap(mocker):
+    """Tests .xml.gz bodies served without Content-Encoding are inflated."""
+    mock_get = _mock_gz_response(mocker, GZ_SITEMAP)
+    fetcher = SitemapFetcher()
+    parser = SitemapParser()
+    url = "http://example.com/sitemap.xml.gz"
+
+    root = fetcher.fetch_sitemap(url)
+    assert parser.extract_loc_elements(root) == ["http://example.com/gz-page"]
+    with fetcher.open_sitemap(url) as stream:
+        assert list(parser.iter_locs(stream)) == [
+            (False, "http://example.com/gz-page")
+        ]
+    assert "gzip" in fetcher._session.headers["Accept-Encoding"]
+    assert mock_get.call_count == 2
+
+
+def test_fetcher_corrupt_gzip_raises_parse_error(mocker):
+    """Tests a truncated gzip body surfaces as ParseError on both paths."""
+    _mock_gz_response(mocker, GZ_SITEMAP[:20])
+    fetcher = SitemapFetcher()
+
+    with pytest.raises(ET.ParseError):
+        fetcher.fetch_sitemap("http://example.com/sitemap.xml.gz")
+    with pytest.raises(ET.ParseError):
+        with fetcher.open_sitemap("http://example.com/sitemap.xml.gz") as stream:
+            list(SitemapParser().iter_locs(stream))
+
+
+def test_fetcher_conditional_request(mocker):
+    """Tests validators are sent as conditional headers and refreshed on 200."""
+    mock_response = mocker.Mock(status_code=200)
+    mock_response.raw = io.BytesIO(b"<urlset/>")
+    mock_response.headers = {"ETag": '"v2"', "Last-Modified": "Tue, 01 Oct 2024"}
+    mock_get = mocker.patch("requests.Session.get", return_value=mock_response)
+    validators = {"etag": '"v1"', "last_modified": "Mon, 30 Sep 2024"}
+
+    with SitemapFetcher().open_sitemap("http://example.com/s.xml", validators):
+        pass
+
+    assert mock_get.call_args.kwargs["headers"] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 30 Sep 2024",
+    }
+    assert validators == {"etag": '"v2"', "last_modified": "Tue, 01 Oct 2024"}
+
+
+def test_fetcher_not_modified(mocker):
+    """Tests a 304 answer raises NotModified without reading a body."""
+    mock_response = mocker.Mock(status_code=304)
+    mocker.patch("requests.Session.get", return_value=mock_response)
+    fetcher = SitemapFetcher()
+
+    with pytest.raises(NotModified):
+        with fetcher.open_sitemap("http://example.com/s.xml", {"etag": '"v1"'}):
+            pass  # pragma: no cover - never reached
+    with pytest.raises(NotModified):
+        fetcher.fetch_sitemap("http://example.com/s.xml", {"etag": '"v1"'})
+    mock_response.raise_for_status.assert_not_called()
+
+
+def test_fetcher_polite_defaults(monkeypatch):
+    """Tests SitemapFetcher throttles and identifies itself by default."""
+    # Pinned so a developer's .env (REQUEST_INTERVAL_SECONDS) cannot leak in
+    monkeypatch.setattr("sitemap_fetcher.fetcher._DEFAULT_REQUEST_INTERVAL", 2.0)
+    fetcher = SitemapFetcher()
+    assert fetcher.request_interval == 2.0
+    assert SitemapFetcher(request_interval=0.5).request_interval == 0.5
+    assert "Sitemap Fetcher" in fetcher.user_agent
+    # pylint: disable=protected-access
+    assert fetcher._session.headers["User-Agent"] == fetcher.user_agent
+
+
+def test_fetcher_max_retries_configures_adapter():
+    """Tests max_retries sets the retry budget of the session's adapter."""
+    with SitemapFetcher(max_retries=0) as fetcher:
+        adapter = fetcher._session.get_adapter("http://example.com/sitemap.xml")
+        assert adapter.max_retries.total == 0
+        assert 429 in adapter.max_retries.status_forcelist
@@ -1,5 +1,6 @@
 # import sys - Removed unused import
 from unittest.mock import MagicMock
+import logging
 import pytest
 import json
 import xml.etree.ElementTree as ET
@@ -89,3 +90,53 @@ def test_main_processor_run_exceptions(
     # Check that sys.exit(1) was called
     mock_exit.assert_called_once_with(1)
     mock_processor_run.assert_called_once()  # Ensure run was called
+
+
+@pytest.mark.parametrize(
+    "flag, expected_level",
+    [
+        pytest.param(None, logging.INFO, id="default"),
+        pytest.param("--verbose", logging.DEBUG, id="verbose"),
+        pytest.param("--quiet", logging.WARNING, id="quiet"),
+    ],
+)
+def test_main_configures_log_level(mocker, flag, expected_level):
+    """Tests --verbose/--quiet set the level of the progress log."""
+    args = ["sitemap_fetcher", "http://example.com/sitemap.xml", "output.txt"]
+    mocker.patch("sys.argv", args + ([flag] if flag else []))
+    mocker.patch("sitemap_fetcher.main.SitemapProcessor")
+    mock_basic_config = mocker.patch("logging.basicConfig")
+
+    sitemap_main()
+
+    assert mock_basic_config.call_args.kwargs["level"] == expected_level
+
+
+def test_main_passes_concurrency_and_retries(mocker):
+    """Tests --concurrency and --max-retries reach the processor config."""
+    args = ["sitemap_fetcher", "http://example.com/sitemap.xml", "output.txt"]
+    mocker.patch("sys.argv", args + ["--concurrency", "3", "--max-retries", "5"])
+    mock_processor = mocker.patch("sitemap_fetcher.main.SitemapProcessor")
+
+    sitemap_main()
+
+    config = mock_processor.call_args.kwargs["config"]
+    assert config.concurrency == 3
+    assert config.fetcher_max_retries == 5
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    [["--concurrency", "0"], ["--max-retries", "-1"], ["--parse-processes", "-1"]],
+    ids=["concurrency", "max_retries", "parse_processes"],
+)
+def test_main_rejects_invalid_fetch_options(mocker, extra_args):
+    """Tests main exits before processing on invalid concurrency/retry/process values."""
+    args = ["sitemap_fetcher", "http://example.com/sitemap.xml", "output.txt"]
+    mocker.patch("sys.argv", args + extra_args)
+    mocker.patch("sys.exit", side_effect=SystemExit)
+    mock_processor = mocker.patch("sitemap_fetcher.main.SitemapProcessor")
+
+    with pytest.raises(SystemExit):
+        sitemap_main()
+    mock_processor.assert_not_called()
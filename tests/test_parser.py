@@ -1,5 +1,8 @@
+import io
 import xml.etree.ElementTree as ET
 
+import pytest
+
 from sitemap_fetcher.parser import SitemapParser
 
 
@@ -17,6 +20,12 @@ def test_parser_is_sitemap_index():
     assert parser.is_sitemap_index(index_root)
     assert not parser.is_sitemap_index(urlset_root)
 
+    # The namespace prefix used in the document does not matter
+    prefixed_xml = (
+        '<sm:sitemapindex xmlns:sm="http://www.sitemaps.org/schemas/sitemap/0.9" />'
+    )
+    assert parser.is_sitemap_index(ET.fromstring(prefixed_xml))
+
 
 def test_parser_extract_loc_elements():
     """Tests SitemapParser extracts <loc> elements correctly."""
@@ -60,10 +69,120 @@ def test_parser_extract_loc_elements():
                          <url><loc>http://example.com/another_valid.html</loc></url>
                        </urlset>"""
     mixed_loc_root = ET.fromstring(mixed_loc_xml)
-    # The filter `if loc.text` should exclude empty strings "", None, but include whitespace "  "
+    # The filter should exclude empty strings "", None and whitespace-only "  "
     expected_mixed_locs = [
         "http://example.com/page_valid.html",
-        "  ",  # Whitespace is treated as valid text by the filter
         "http://example.com/another_valid.html",
     ]
     assert parser.extract_loc_elements(mixed_loc_root) == expected_mixed_locs
+
+
+def test_parser_extract_loc_elements_lxml():
+    """Tests lxml elements take the compiled XPath path with the same results."""
+    etree = pytest.importorskip("lxml.etree")
+    parser = SitemapParser()
+
+    mixed_loc_xml = b"""<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                         <url><loc>http://example.com/page_valid.html</loc></url>
+                         <url><loc></loc></url>
+                         <url><loc/></url>
+                         <url><loc>  </loc></url>
+                         <url><loc>http://example.com/another_valid.html</loc></url>
+                       </urlset>"""
+    root = etree.fromstring(mixed_loc_xml)
+    locs = parser.extract_loc_elements(root)
+
+    assert locs == [
+        "http://example.com/page_valid.html",
+        "http://example.com/another_valid.html",
+    ]
+    assert all(type(loc) is str for loc in locs)
+    assert parser.extract_loc_elements(etree.fromstring(b"<root />")) == []
+
+
+def test_parser_iter_locs(xml_backend):
+    """Tests SitemapParser streams (is_index, loc) pairs from a byte stream."""
+    parser = SitemapParser()
+
+    index_xml = b"""<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                     <sitemap><loc>http://example.com/sitemap1.xml</loc></sitemap>
+                     <sitemap><loc/></sitemap>
+                     <sitemap><loc>   </loc></sitemap>
+                     <sitemap><loc>http://example.com/sitemap2.xml</loc></sitemap>
+                   </sitemapindex>"""
+    assert list(parser.iter_locs(io.BytesIO(index_xml))) == [
+        (True, "http://example.com/sitemap1.xml"),
+        (True, "http://example.com/sitemap2.xml"),
+    ]
+
+    urlset_xml = b"""<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                      <url><loc>http://example.com/page1.html</loc></url>
+                      <url><loc>http://example.com/page2.html</loc></url>
+                    </urlset>"""
+    assert list(parser.iter_locs(io.BytesIO(urlset_xml))) == [
+        (False, "http://example.com/page1.html"),
+        (False, "http://example.com/page2.html"),
+    ]
+
+
+def test_parser_iter_locs_bad_xml():
+    """Tests malformed XML raises ET.ParseError whichever backend is used."""
+    parser = SitemapParser()
+    with pytest.raises(ET.ParseError):
+        list(parser.iter_locs(io.BytesIO(b"<root><unclosed-tag</root>")))
+
+
+def test_parser_iter_locs_rejects_unknown_root(xml_backend):
+    """Tests a well-formed document that is not a sitemap raises ET.ParseError."""
+    parser = SitemapParser()
+
+    with pytest.raises(ET.ParseError, match="not a sitemap"):
+        list(parser.iter_locs(io.BytesIO(b"<html><body>Oops</body></html>")))
+
+    empty_urlset = b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"/>'
+    assert not list(parser.iter_locs(io.BytesIO(empty_urlset)))
+
+
+def test_parser_iter_locs_ignores_extension_locs(xml_backend):
+    """Tests <loc> elements from other namespaces (e.g. image sitemaps) are skipped."""
+    parser = SitemapParser()
+
+    urlset_xml = b"""<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+                      xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
+                      xmlns:xhtml="http://www.w3.org/1999/xhtml">
+                      <url>
+                        <loc>http://example.com/page1.html</loc>
+                        <image:image><image:loc>http://example.com/a.jpg</image:loc></image:image>
+                        <xhtml:link rel="alternate" hreflang="de" href="http://example.com/de/"/>
+                      </url>
+                      <url><loc>http://example.com/page2.html</loc></url>
+                    </urlset>"""
+    assert list(parser.iter_locs(io.BytesIO(urlset_xml))) == [
+        (False, "http://example.com/page1.html"),
+        (False, "http://example.com/page2.html"),
+    ]
+
+
+def test_parser_strips_whitespace_around_locs(xml_backend):
+    """Tests indentation around <loc> text is not kept in the extracted URLs."""
+    parser = SitemapParser()
+
+    urlset_xml = b"""<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+                      <url>
+                        <loc>
+                          http://example.com/page1.html
+                        </loc>
+                      </url>
+                      <url><loc>\thttp://example.com/page2.html </loc></url>
+                    </urlset>"""
+    expected = ["http://example.com/page1.html", "http://example.com/page2.html"]
+
+    assert list(parser.iter_locs(io.BytesIO(urlset_xml))) == [
+        (False, url) for url in expected
+    ]
+    if xml_backend == "lxml":
+        etree = pytest.importorskip("lxml.etree")
+        root = etree.fromstring(urlset_xml)
+    else:
+        root = ET.fromstring(urlset_xml)
+    assert parser.extract_loc_elements(root) == expected
@@ -1,13 +1,14 @@
+import io
 import os
 import json
 import signal
 import pytest
-import requests  # Needed for side_effect RequestException in tests
 
 from sitemap_fetcher.processor import SitemapProcessor, ProcessorConfig
+from sitemap_fetcher.parser import NAMESPACE, SitemapParser
 
 
-def test_processor_success(tmp_path, patch_requests):
+def test_processor_success(tmp_path, patch_requests, xml_backend):
     """Tests SitemapProcessor runs successfully and produces correct output."""
     output_file = tmp_path / "output_proc_success.txt"
     state_file = tmp_path / "state_proc_success.json"
@@ -25,21 +26,20 @@ def test_processor_success(tmp_path, patch_requests):
         content = f.read()
         assert "http://example.com/page1" in content
         assert "http://example.com/page2" in content
+    # Saved state contents are covered by the resume tests; check it in memory
     assert os.path.exists(state_file)
-    with open(state_file, "r", encoding="utf-8") as f:
-        final_state = json.load(f)
-        assert not final_state["sitemap_queue"]
-        assert set(final_state["processed_sitemaps"]) == {
-            "http://example.com/index.xml",
-            "http://example.com/child.xml",
-        }
-        assert set(final_state["found_urls"]) == {
-            "http://example.com/page1",
-            "http://example.com/page2",
-        }
+    assert not processor.sitemap_queue
+    assert processor.processed_sitemaps == {
+        "http://example.com/index.xml",
+        "http://example.com/child.xml",
+    }
+    assert processor.found_urls == {
+        "http://example.com/page1",
+        "http://example.com/page2",
+    }
 
 
-def test_processor_handles_request_exception(tmp_path, patch_requests, capsys):
+def test_processor_handles_request_exception(tmp_path, patch_requests, caplog):
     """Tests SitemapProcessor handles RequestException gracefully."""
     output_file = tmp_path / "output_error.txt"
     state_file = tmp_path / "state_error.json"
@@ -52,21 +52,10 @@ def test_processor_handles_request_exception(tmp_path, patch_requests, capsys):
     processor = SitemapProcessor(config=config)
     processor.run()
 
-    captured = capsys.readouterr()
-    assert "Error fetching sitemap http://error.com/sitemap.xml" in captured.out
-    assert "Skipping." in captured.err
-    assert os.path.exists(state_file)
-    assert os.path.exists(output_file)
-    assert output_file.read_text(encoding="utf-8") == ""
-
-    # Assert the specific stderr message from the except block (lines 205-206)
-    assert f"Failed to fetch {config.sitemap_url}. Skipping." in captured.err
-    # Check stdout for fetcher's message (optional but good)
-    assert f"Error fetching sitemap {config.sitemap_url}" in captured.out
-    # assert "Error fetching sitemap http://error.com/sitemap.xml" in captured.out
-    # assert "Skipping." in captured.err
+    # Both the fetcher's error and the processor's skip message are logged
+    assert f"Error fetching sitemap {config.sitemap_url}" in caplog.text
+    assert f"Failed to fetch {config.sitemap_url}. Skipping." in caplog.text
 
-    assert os.path.exists(state_file)
     # State should reflect that the error URL was attempted but not fully processed
     final_state = json.loads(state_file.read_text(encoding="utf-8"))
     assert (
@@ -74,12 +63,10 @@ def test_processor_handles_request_exception(tmp_path, patch_requests, capsys):
     )  # It failed before being marked processed
     assert not final_state["found_urls"]
     assert not final_state["sitemap_queue"]
-
-    assert os.path.exists(output_file)
     assert output_file.read_text(encoding="utf-8") == ""
 
 
-def test_processor_handles_parse_error(tmp_path, patch_requests, capsys):
+def test_processor_handles_parse_error(tmp_path, patch_requests, caplog):
     """Tests SitemapProcessor handles ET.ParseError gracefully."""
     output_file = tmp_path / "output_badxml.txt"
     state_file = tmp_path / "state_badxml.json"
@@ -92,9 +79,8 @@ def test_processor_handles_parse_error(tmp_path, patch_requests, capsys):
     processor = SitemapProcessor(config=config)
     processor.run()
 
-    captured = capsys.readouterr()
-    assert "Error parsing XML from http://badxml.com/sitemap.xml" in captured.out
-    assert "Skipping." in captured.err
+    assert "Error parsing XML from http://badxml.com/sitemap.xml" in caplog.text
+    assert "Skipping." in caplog.text
     assert os.path.exists(state_file)
     assert os.path.exists(output_file)
     assert output_file.read_text(encoding="utf-8") == ""
@@ -117,7 +103,7 @@ def test_processor_honors_limit(tmp_path, patch_requests):
 
     assert os.path.exists(output_file)
     with open(output_file, "r", encoding="utf-8") as f:
-        urls = f.read().strip().split("\n")
+        urls = f.read().splitlines()
         assert len(urls) == limit
         assert "http://limited.com/page1" in urls
         assert "http://limited.com/page2" in urls
@@ -127,8 +113,9 @@ def test_processor_honors_limit(tmp_path, patch_requests):
     with open(state_file, "r", encoding="utf-8") as f:
         final_state = json.load(f)
         assert len(final_state["found_urls"]) == limit
-        assert not final_state["sitemap_queue"]
-        assert final_state["processed_sitemaps"] == ["http://limited.com/sitemap.xml"]
+        # Cut short by the limit, so it stays queued rather than processed
+        assert final_state["sitemap_queue"] == ["http://limited.com/sitemap.xml"]
+        assert not final_state["processed_sitemaps"]
 
 
 def test_processor_resumes_correctly(tmp_path, patch_requests):
@@ -136,18 +123,7 @@ def test_processor_resumes_correctly(tmp_path, patch_requests):
     output_file = tmp_path / "output_resume.txt"
     state_file = tmp_path / "state_resume.json"
 
-    # --- Phase 1: Run partially and save state ---
-    limit = 2
-    config_phase1 = ProcessorConfig(
-        sitemap_url="http://resume.com/index.xml",
-        output_file=str(output_file),
-        state_file=str(state_file),
-        limit=limit,
-    )
-    processor_phase1 = SitemapProcessor(config=config_phase1)
-    processor_phase1.run()
-
-    # Create initial state using the *correct* keys for Phase 2
+    # --- Phase 1: State as left by a run stopped at limit=2 ---
     initial_state_to_write = {
         "sitemap_queue": ["http://resume.com/child2.xml"],
         "processed_sitemaps": [
@@ -156,15 +132,7 @@ def test_processor_resumes_correctly(tmp_path, patch_requests):
         ],
         "found_urls": ["http://resume.com/pageA", "http://resume.com/pageB"],
     }
-    with open(state_file, "w", encoding="utf-8") as f:
-        json.dump(initial_state_to_write, f)
-
-    # Check intermediate state (read back what was written)
-    assert os.path.exists(state_file)
-    with open(state_file, "r", encoding="utf-8") as f:
-        read_state = json.load(f)
-        assert len(read_state["found_urls"]) == limit
-        assert "http://resume.com/child2.xml" in read_state["sitemap_queue"]
+    state_file.write_text(json.dumps(initial_state_to_write), encoding="utf-8")
 
     # --- Phase 2: Run again with --resume ---
     config_phase2 = ProcessorConfig(
@@ -181,7 +149,7 @@ def test_processor_resumes_correctly(tmp_path, patch_requests):
     # --- Asserts ---
     assert os.path.exists(output_file)
     with open(output_file, "r", encoding="utf-8") as f:
-        final_urls = set(f.read().strip().split("\n"))
+        final_urls = set(f.read().splitlines())
         assert len(final_urls) == 4
         assert final_urls == {
             "http://resume.com/pageA",
@@ -203,7 +171,7 @@ def test_processor_resumes_correctly(tmp_path, patch_requests):
 
 
 # Test for invalid JSON in state file
-def test_processor_resume_invalid_json(tmp_path, capsys):
+def test_processor_resume_invalid_json(tmp_path, patch_requests, caplog):
     """Tests processor handles invalid JSON in state file gracefully."""
     output_file = tmp_path / "output_invalid_json.txt"
     state_file = tmp_path / "state_invalid_json.json"
@@ -222,11 +190,10 @@ def test_processor_resume_invalid_json(tmp_path, capsys):
     processor = SitemapProcessor(config=config)
     processor.run()  # Should not raise error, should print warning and start fresh
 
-    captured = capsys.readouterr()
     assert (
-        f"Error loading or decoding state file {state_file}" in captured.out
-    )  # Check stdout for specific error start
-    assert "Starting fresh." in captured.out  # Confirms it didn't use bad state
+        f"Error loading or decoding state file {state_file}" in caplog.text
+    )  # Check the log for specific error start
+    assert "Starting fresh." in caplog.text  # Confirms it didn't use bad state
 
 
 # Test for invalid data structure in state file
@@ -247,54 +214,47 @@ def test_processor_resume_invalid_json(tmp_path, capsys):
     ],
 )
 def test_processor_resume_invalid_state_data(
-    tmp_path, capsys, state_content, expected_error_fragment, mocker
+    tmp_path, caplog, state_content, expected_error_fragment
 ):
     """Tests processor handles missing/invalid keys in state file gracefully."""
+    state_file = tmp_path / "state_invalid_state.json"
+    root_url = "http://example.com/sitemap.xml"
+    state_file.write_text(state_content, encoding="utf-8")
+
+    config = ProcessorConfig(
+        sitemap_url=root_url,
+        output_file=str(tmp_path / "output_invalid_state.txt"),
+        state_file=str(state_file),
+        resume=True,
+    )
+    processor = SitemapProcessor(config=config)
+    # Left over from an earlier load: starting fresh must not keep any of it
+    processor.processed_sitemaps = {root_url}
+    processor.found_urls = {"http://example.com/stale"}
+    # Only loading is under test here; a full fresh run is covered below
+    processor._load_state()  # pylint: disable=protected-access
+
+    assert "Error loading state" in caplog.text
+    assert "Invalid state data format" in caplog.text
+    # Check for the raw exception message part
+    assert expected_error_fragment in caplog.text
+    assert "Starting fresh." in caplog.text
+    assert list(processor.sitemap_queue) == [root_url]
+    assert not processor.processed_sitemaps
+    assert not processor.found_urls
+    assert not processor.found_urls
+
+
+def test_processor_resume_invalid_state_data_full_run(tmp_path, patch_requests, caplog):
+    """Tests a run with an invalid state file starts fresh and completes."""
     output_file = tmp_path / "output_invalid_state.txt"
     state_file = tmp_path / "state_invalid_state.json"
     root_url = "http://example.com/sitemap.xml"
     child_url = "http://example.com/child.xml"
-
-    # Explicit mock for requests.get within this test
-    mock_response_root = mocker.Mock()
-    mock_response_root.raise_for_status.return_value = None
-    mock_response_root.text = f"""<?xml version="1.0" encoding="UTF-8"?>
-    <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-       <sitemap>
-          <loc>{child_url}</loc>
-       </sitemap>
-    </sitemapindex>"""
-    mock_response_root.encoding = "utf-8"
-    mock_response_root.content = mock_response_root.text.encode("utf-8")
-
-    mock_response_child = mocker.Mock()
-    mock_response_child.raise_for_status.return_value = None
-    mock_response_child.text = """<?xml version="1.0" encoding="UTF-8"?>
-    <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-       <url><loc>http://example.com/page1</loc></url>
-       <url><loc>http://example.com/page2</loc></url>
-    </urlset>"""
-    mock_response_child.encoding = "utf-8"
-    mock_response_child.content = mock_response_child.text.encode("utf-8")
-
-    def side_effect_requests_get(url, timeout, **kwargs):
-        if url == root_url:
-            return mock_response_root
-        elif url == child_url:
-            return mock_response_child
-        else:
-            raise requests.RequestException(f"Unexpected URL in test: {url}")
-
-    _ = mocker.patch("requests.get", side_effect=side_effect_requests_get)
-
-    # Create invalid state file
-    # state_data = {"sitemap_queue": ["http://example.com/"], "processed_sitemaps": "not_a_list"}
-    # state_file.write_text(json.dumps(state_data), encoding="utf-8")
-    state_file.write_text(state_content, encoding="utf-8")
+    state_file.write_text('{"sitemap_queue": []}', encoding="utf-8")
 
     config = ProcessorConfig(
         sitemap_url=root_url,
-        # sitemap_url="http://example.com/child.xml",  # Use existing mock URL
         output_file=str(output_file),
         state_file=str(state_file),
         resume=True,
@@ -302,43 +262,21 @@ def test_processor_resume_invalid_state_data(
     processor = SitemapProcessor(config=config)
     processor.run()
 
-    captured = capsys.readouterr()
-    # Debugging print statement (optional, can remove later)
-    print(
-        f"\nCaptured stdout for state_content='{state_content}':\n{captured.out}\n---"
-    )
+    assert "Invalid state data format" in caplog.text
+    assert "Starting fresh." in caplog.text
 
-    # Assert the key components are present in the output
-    assert "Error loading state" in captured.out
-    assert "Invalid state data format" in captured.out
-    # Check for the raw exception message part
-    assert (
-        expected_error_fragment in captured.out
-    )  # Check for KeyError('found_urls') or Invalid type...
-    # assert expected_error_fragment in captured.out # Check for KeyError('found_urls') or Invalid type...
-    # The error message format seems to be "Invalid state data format: {e}" where e is the exception detail
-    # assert f"Invalid state data format: {expected_error_fragment}" in captured.out
-    assert "Starting fresh." in captured.out
-
-    # Assert that it started fresh and processed the root_url -> child_url
-    assert output_file.exists()
-    output_content = output_file.read_text(encoding="utf-8").strip().split("\n")
     # Since it starts fresh with root_url, it should process root, find child, process child
+    output_content = output_file.read_text(encoding="utf-8").splitlines()
     assert "http://example.com/page1" in output_content
     assert "http://example.com/page2" in output_content
-    # assert "http://example.com/page1" in output_content
-    # assert "http://example.com/page2" in output_content
-    # assert root_url in final_state["processed_sitemaps"] # Check fresh state processed root
 
-    assert state_file.exists()
     final_state = json.loads(state_file.read_text(encoding="utf-8"))
-    # Check fresh state processed root and child
     assert root_url in final_state["processed_sitemaps"]
     assert child_url in final_state["processed_sitemaps"]
     assert not final_state["sitemap_queue"]  # Should be empty after fresh run
 
 
-def test_processor_resume_non_existent_state_file(tmp_path, patch_requests, capsys):
+def test_processor_resume_non_existent_state_file(tmp_path, patch_requests, caplog):
     """Tests processor handles non-existent state file when resume=True."""
     output_file = tmp_path / "output_no_state.txt"
     state_file = tmp_path / "non_existent_state.json"  # Does not exist
@@ -352,18 +290,17 @@ def test_processor_resume_non_existent_state_file(tmp_path, patch_requests, caps
     processor = SitemapProcessor(config=config)
     processor.run()
 
-    captured = capsys.readouterr()
     # Check for the specific message in _load_state for FileNotFoundError path
     # Although the code currently prints "State file not found", let's be robust
     # It falls through to the FileNotFoundError handler which prints the msg
-    assert f"State file not found at {state_file}, starting fresh." in captured.out
+    assert f"State file not found at {state_file}, starting fresh." in caplog.text
     # Verify it ran correctly despite the missing state file
     assert output_file.exists()
     assert "http://example.com/page1" in output_file.read_text(encoding="utf-8")
     assert "http://example.com/page2" in output_file.read_text(encoding="utf-8")
 
 
-def test_processor_resume_empty_queue_in_state(tmp_path, patch_requests, capsys):
+def test_processor_resume_empty_queue_in_state(tmp_path, patch_requests, caplog):
     """Tests processor re-initializes queue if state file queue is empty."""
     output_file = tmp_path / "output_empty_q.txt"
     state_file = tmp_path / "state_empty_q.json"
@@ -387,13 +324,12 @@ def test_processor_resume_empty_queue_in_state(tmp_path, patch_requests, capsys)
     processor = SitemapProcessor(config=config)
     processor.run()  # This calls _load_state internally
 
-    captured = capsys.readouterr()
     # Assert that the specific message for re-initializing from empty queue was printed
-    assert "State file queue empty, initializing with root sitemap URL." in captured.out
+    assert "State file queue empty, initializing with root sitemap URL." in caplog.text
 
     # Assert that processing happened (URLs from root_url were added)
     assert output_file.exists()
-    output_content = output_file.read_text(encoding="utf-8").strip().split("\n")
+    output_content = output_file.read_text(encoding="utf-8").splitlines()
     # Check for URLs known to be in http://example.com/child.xml mock
     assert "http://example.com/page1" in output_content
     assert "http://example.com/page2" in output_content
@@ -408,7 +344,7 @@ def test_processor_resume_empty_queue_in_state(tmp_path, patch_requests, capsys)
     assert not final_state["sitemap_queue"]
 
 
-def test_processor_resume_load_state_io_error(tmp_path, patch_requests, mocker, capsys):
+def test_processor_resume_load_state_io_error(tmp_path, patch_requests, mocker, caplog):
     """Tests processor handles IOError during state file reading on resume."""
     output_file = tmp_path / "output_load_ioerr.txt"
     state_file = tmp_path / "state_load_ioerr.json"
@@ -422,39 +358,27 @@ def test_processor_resume_load_state_io_error(tmp_path, patch_requests, mocker,
     )
     processor = SitemapProcessor(config=config)
 
-    # Capture the real open function *before* patching
-    real_open = open
-
-    # Mock open specifically for reading the state file to raise IOError
-    # Need to use the correct import path for 'open' which is 'builtins.open'
-    mock_open = mocker.patch("builtins.open")
-
-    # Change signature, determine mode inside, pass *args/**kwargs through
-    def open_side_effect_read(file, *args, **kwargs):
-        # Determine mode from actual arguments passed
-        mode = args[0] if args and isinstance(args[0], str) else kwargs.get("mode", "r")
-        if file == str(state_file) and "r" in mode:
-            raise IOError("Simulated disk read error")
-        # Use the *real* open for other files/modes
-        return real_open(file, *args, **kwargs)
-
-    mock_open.side_effect = open_side_effect_read
+    # Patch ``open`` only as seen by the state manager, not interpreter-wide
+    mocker.patch(
+        "sitemap_fetcher.state_manager.open",
+        create=True,
+        side_effect=IOError("Simulated disk read error"),
+    )
 
     processor.run()
 
-    captured = capsys.readouterr()
     # Check if the specific error message for IOError during load was printed
     assert (
         f"Error reading state file {state_file}: Simulated disk read error"
-        in captured.out
+        in caplog.text
     )
-    assert "Starting fresh." in captured.out
+    assert "Starting fresh." in caplog.text
     # Verify it ran correctly starting fresh
     assert output_file.exists()
     assert "http://example.com/page1" in output_file.read_text(encoding="utf-8")
 
 
-def test_processor_save_state_io_error(tmp_path, patch_requests, mocker, capsys):
+def test_processor_save_state_io_error(tmp_path, patch_requests, mocker, caplog):
     """Tests processor handles IOError during state file writing."""
     output_file = tmp_path / "output_save_ioerr.txt"
     state_file = tmp_path / "state_save_ioerr.json"
@@ -467,30 +391,18 @@ def test_processor_save_state_io_error(tmp_path, patch_requests, mocker, capsys)
     )
     processor = SitemapProcessor(config=config)
 
-    # Capture the real open function *before* patching
-    real_open = open
-
-    # Mock open specifically for writing the state file to raise IOError
-    mock_open = mocker.patch("builtins.open")
-
-    # Change signature, determine mode inside, pass *args/**kwargs through
-    def open_side_effect_write(file, *args, **kwargs):
-        mode = args[0] if args and isinstance(args[0], str) else kwargs.get("mode", "r")
-        # Check mode contains 'w'
-        if file == str(state_file) and "w" in mode:
-            raise IOError("Simulated disk write error")
-        # Use the *real* open for other files/modes
-        return real_open(file, *args, **kwargs)
-
-    mock_open.side_effect = open_side_effect_write
+    # State is written to a temporary file first; make creating it fail
+    mocker.patch(
+        "sitemap_fetcher.state_manager.tempfile.mkstemp",
+        side_effect=IOError("Simulated disk write error"),
+    )
 
     processor.run()
 
-    captured = capsys.readouterr()
-    # Check stderr for the specific error message
+    # Check the log for the specific error message
     assert (
         f"Error saving state file {state_file}: Simulated disk write error"
-        in captured.err
+        in caplog.text
     )
     # Verify the main process still worked and output was written
     assert output_file.exists()
@@ -542,8 +454,8 @@ def test_processor_signal_during_processing(tmp_path, patch_requests, mocker, si
     )
 
     # Run the processor. Expect the mocked signal.signal to be called,
-    # then the loop starts, calls _process_single_sitemap (mocked), which triggers the handler
-    # (_save_state, sys.exit).
+    # then the loop starts, calls _process_single_sitemap (mocked), which triggers the handler;
+    # run() then stops submitting work and saves state itself.
     processor.run()
 
     # Assertions
@@ -552,10 +464,9 @@ def test_processor_signal_during_processing(tmp_path, patch_requests, mocker, si
     # Ensure _process_single_sitemap was invoked at least once
     # (So our side effect executed)
     # The wraps on _save_state+assertions cover this indirectly.
-    # Check that state was saved and exit called by the handler
-    # State should have been saved at least once (signal handler, possibly final save)
-    assert mock_save_state.call_count >= 1
-    mock_exit.assert_called_once_with(0)
+    # Check that state was saved once, after the workers drained, without exiting
+    mock_save_state.assert_called_once_with()
+    mock_exit.assert_not_called()
     assert state_file.exists()
 
     # Verify state content (signal triggered after first sitemap processing)
@@ -565,13 +476,77 @@ def test_processor_signal_during_processing(tmp_path, patch_requests, mocker, si
         # should reflect that the initial sitemap got processed but no URLs
         # from child sitemaps were added yet.
         assert "http://example.com/index.xml" in saved_state["processed_sitemaps"]
-        # Depending on exact timing, sitemap_queue may still have items or be empty.
-        # We assert that found_urls is still empty.
+        # No further sitemaps were started, so the children are still queued
+        # and no URLs have been found yet.
+        assert saved_state["sitemap_queue"]
         assert not saved_state["found_urls"]
 
 
+def test_processor_signal_requeues_unfinished_sitemap(tmp_path, patch_requests, mocker):
+    """Tests a sitemap interrupted mid-stream goes back on the saved queue."""
+    state_file = tmp_path / "state_interrupted.json"
+    config = ProcessorConfig(
+        sitemap_url="http://example.com/child.xml",
+        output_file=str(tmp_path / "output_interrupted.txt"),
+        state_file=str(state_file),
+    )
+    processor = SitemapProcessor(config=config, parser=SitemapParser())
+    mocker.patch("signal.signal")
+    # Hand over one <loc> at a time so the signal lands between entries
+    mocker.patch("sitemap_fetcher.processor._LOC_BATCH_SIZE", 1)
+    real_iter_locs = processor.parser.iter_locs
+
+    def interrupted_iter_locs(stream):
+        for item in real_iter_locs(stream):
+            yield item
+            # pylint: disable=protected-access
+            processor._signal_handler(signal.SIGTERM, None)
+
+    mocker.patch.object(processor.parser, "iter_locs", interrupted_iter_locs)
+    processor.run()
+
+    saved_state = json.loads(state_file.read_text(encoding="utf-8"))
+    assert saved_state["sitemap_queue"] == ["http://example.com/child.xml"]
+    assert not saved_state["processed_sitemaps"]
+    assert saved_state["found_urls"] == ["http://example.com/page1"]
+
+
+def test_processor_signal_after_limit_shuts_down_gracefully(
+    tmp_path, patch_requests, mocker, caplog
+):
+    """Tests a first signal after the URL limit is hit still saves state."""
+    state_file = tmp_path / "state_signal_limit.json"
+    config = ProcessorConfig(
+        sitemap_url="http://limited.com/sitemap.xml",
+        output_file=str(tmp_path / "output_signal_limit.txt"),
+        state_file=str(state_file),
+        limit=2,
+    )
+    processor = SitemapProcessor(config=config)
+    mocker.patch("signal.signal")
+    mock_exit = mocker.patch("sys.exit")
+    # pylint: disable=protected-access
+    real_add_urls = processor._add_urls
+
+    def add_urls_then_signal(batch, new_urls):
+        result = real_add_urls(batch, new_urls)
+        if processor._limit_reached:
+            # The sitemap that hit the limit is still in flight
+            processor._signal_handler(signal.SIGINT, None)
+        return result
+
+    mocker.patch.object(processor, "_add_urls", side_effect=add_urls_then_signal)
+    processor.run()
+
+    mock_exit.assert_not_called()
+    assert "Stopping workers and saving state..." in caplog.text
+    saved_state = json.loads(state_file.read_text(encoding="utf-8"))
+    assert len(saved_state["found_urls"]) == 2
+    assert saved_state["sitemap_queue"] == ["http://limited.com/sitemap.xml"]
+
+
 @pytest.mark.parametrize("sig", [signal.SIGINT, signal.SIGTERM])
-def test_processor_signal_outside_processing(tmp_path, capsys, sig, mocker):
+def test_processor_signal_outside_processing(tmp_path, caplog, sig, mocker):
     """Tests immediate exit on signal outside active processing."""
     output_file = tmp_path / "output_signal_idle.txt"
     state_file = tmp_path / "state_signal_idle.json"
@@ -603,12 +578,12 @@ def test_processor_signal_outside_processing(tmp_path, capsys, sig, mocker):
 
     assert (
         f"Signal {sig} received during shutdown. Exiting immediately."
-        in capsys.readouterr().out
+        in caplog.text
     )
 
 
 # Test for empty initial queue check in run() (lines 233-234)
-def test_processor_run_with_empty_initial_queue(tmp_path, capsys, mocker):
+def test_processor_run_with_empty_initial_queue(tmp_path, caplog, mocker):
     """Tests run() handles an empty queue *after* _load_state."""
     output_file = tmp_path / "output_empty_run.txt"
     state_file = tmp_path / "state_empty_run.json"
@@ -632,9 +607,8 @@ def test_processor_run_with_empty_initial_queue(tmp_path, capsys, mocker):
 
     processor.run()
 
-    captured = capsys.readouterr()
     # Assert the specific message from the check (lines 233-234)
-    assert "Initial sitemap queue is empty. Nothing to process." in captured.out
+    assert "Initial sitemap queue is empty. Nothing to process." in caplog.text
 
     # Assert that no processing happened and no output was written
     assert not output_file.exists()
@@ -646,7 +620,7 @@ def test_processor_run_with_empty_initial_queue(tmp_path, capsys, mocker):
 
 
 # Test for IOError when writing output file (covers lines 205-206)
-def test_processor_write_output_io_error(tmp_path, capsys, mocker):
+def test_processor_write_output_io_error(tmp_path, patch_requests, caplog, mocker):
     """Tests handling of IOError when writing the final output file."""
     output_file = tmp_path / "output_io_error.txt"
     state_file = tmp_path / "state_io_error.json"
@@ -658,36 +632,23 @@ def test_processor_write_output_io_error(tmp_path, capsys, mocker):
         state_file=str(state_file),
     )
 
-    # Mock requests.get to return a simple sitemap
-    mock_response = mocker.Mock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.text = (
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-        "<url><loc>http://example.com/page1</loc></url>"
-        "</urlset>"
-    )
-    mock_response.encoding = "utf-8"
-    mock_response.content = mock_response.text.encode("utf-8")
-    mocker.patch("requests.get", return_value=mock_response)
-
-    # Mock open specifically for the output file path to raise IOError
-    original_open = open
-
+    # Make opening the output file fail; ``open`` is patched only as seen by
+    # the processor module, so the journal and other modules are unaffected
     def open_side_effect(path, *args, **kwargs):
         if str(path) == str(output_file):
             raise IOError("Disk full")
-        return original_open(path, *args, **kwargs)
+        return open(path, *args, **kwargs)
 
-    mocker.patch("builtins.open", side_effect=open_side_effect)
+    mocker.patch(
+        "sitemap_fetcher.processor.open", create=True, side_effect=open_side_effect
+    )
 
     processor = SitemapProcessor(config=config)
     processor.run()
 
-    captured = capsys.readouterr()
-
-    # Assert that the IOError during writing was caught and printed to stderr
+    # Assert that the IOError during writing was caught and logged
     assert (
-        f"Error writing to output file {config.output_file}: Disk full" in captured.err
+        f"Error writing to output file {config.output_file}: Disk full" in caplog.text
     )
 
     # Ensure the specific problematic 'open' call was attempted
@@ -696,7 +657,7 @@ def test_processor_write_output_io_error(tmp_path, capsys, mocker):
 
 
 # Test for resuming with an empty state file (previously covered indirectly)
-def test_processor_resume_with_empty_state_file(tmp_path, capsys, mocker):
+def test_processor_resume_with_empty_state_file(tmp_path, patch_requests, caplog):
     output_file = tmp_path / "output_empty_state.txt"
     state_file = tmp_path / "state_empty_state.json"
     root_url = "http://example.com/empty_state.xml"
@@ -708,23 +669,363 @@ def test_processor_resume_with_empty_state_file(tmp_path, capsys, mocker):
         resume=True,
     )
 
-    # Mock requests.get to return an empty sitemap
-    mock_response = mocker.Mock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.text = (
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"></urlset>'
-    )
-    mock_response.encoding = "utf-8"
-    mock_response.content = mock_response.text.encode("utf-8")
-    mocker.patch("requests.get", return_value=mock_response)
-
     processor = SitemapProcessor(config=config)
     processor.run()
 
-    captured = capsys.readouterr()
-
     # Assert that the processor started fresh and processed the root URL (case-insensitive)
-    assert "starting fresh." in captured.out.lower()
+    assert "starting fresh." in caplog.text.lower()
     assert output_file.exists()
     assert "http://example.com/page1" not in output_file.read_text(encoding="utf-8")
     assert "http://example.com/page2" not in output_file.read_text(encoding="utf-8")
+
+
+def test_processor_fetches_child_sitemaps_concurrently(tmp_path, patch_requests):
+    """Tests every child of an index is processed when fetched in parallel."""
+    output_file = tmp_path / "output_concurrent.txt"
+    state_file = tmp_path / "state_concurrent.json"
+
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(output_file),
+        state_file=str(state_file),
+        concurrency=4,
+    )
+    processor = SitemapProcessor(config=config)
+    processor.run()
+
+    assert set(output_file.read_text(encoding="utf-8").split()) == {
+        "http://resume.com/pageA",
+        "http://resume.com/pageB",
+        "http://resume.com/pageC",
+        "http://resume.com/pageD",
+    }
+    final_state = json.loads(state_file.read_text(encoding="utf-8"))
+    assert not final_state["sitemap_queue"]
+    assert set(final_state["processed_sitemaps"]) == {
+        "http://resume.com/index.xml",
+        "http://resume.com/child1.xml",
+        "http://resume.com/child2.xml",
+    }
+
+
+def test_processor_parses_in_worker_processes(tmp_path, patch_requests, caplog):
+    """Tests sitemaps parsed on a process pool give the same results."""
+    output_file = tmp_path / "output_processes.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(output_file),
+        parse_processes=2,
+    )
+    processor = SitemapProcessor(config=config)
+    processor.run()
+
+    assert set(output_file.read_text(encoding="utf-8").split()) == {
+        "http://resume.com/pageA",
+        "http://resume.com/pageB",
+        "http://resume.com/pageC",
+        "http://resume.com/pageD",
+    }
+    assert processor._parse_pool is None  # pylint: disable=protected-access
+
+    # Parse errors raised in a worker process are handled like local ones
+    config.sitemap_url = "http://badxml.com/sitemap.xml"
+    SitemapProcessor(config=config).run()
+    assert "Failed to parse http://badxml.com/sitemap.xml. Skipping." in caplog.text
+
+
+def test_processor_refresh_skips_unchanged_sitemaps(tmp_path, mocker, caplog):
+    """Tests --refresh re-checks every sitemap conditionally, even below a 304 index."""
+    bodies = {
+        "http://cond.com/index.xml": f"""<sitemapindex xmlns="{NAMESPACE}">
+            <sitemap><loc>http://cond.com/child.xml</loc></sitemap>
+        </sitemapindex>""".encode(),
+        "http://cond.com/child.xml": f"""<urlset xmlns="{NAMESPACE}">
+            <url><loc>http://cond.com/page1</loc></url>
+        </urlset>""".encode(),
+    }
+    requested = []
+
+    def fake_get(url, timeout, headers=None, **kwargs):
+        requested.append((url, headers))
+        etag = f'"{url}"'
+        unchanged = headers is not None and headers.get("If-None-Match") == etag
+        response = mocker.Mock(status_code=304 if unchanged else 200)
+        response.headers = {"ETag": etag}
+        response.raw = io.BytesIO(bodies[url])
+        return response
+
+    mocker.patch("requests.Session.get", side_effect=fake_get)
+    output_file = tmp_path / "output_refresh.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://cond.com/index.xml", output_file=str(output_file)
+    )
+    SitemapProcessor(config=config).run()
+    assert [headers for _, headers in requested] == [None, None]
+
+    requested.clear()
+    config.resume = config.refresh = True
+    SitemapProcessor(config=config).run()
+
+    # The unchanged index answers 304, but its recorded child is still checked
+    assert requested == [
+        ("http://cond.com/index.xml", {"If-None-Match": '"http://cond.com/index.xml"'}),
+        ("http://cond.com/child.xml", {"If-None-Match": '"http://cond.com/child.xml"'}),
+    ]
+    assert "Not modified since the last fetch." in caplog.text
+    assert output_file.read_text(encoding="utf-8").split() == ["http://cond.com/page1"]
+
+
+def test_processor_writes_urls_once_per_sitemap(tmp_path, patch_requests, mocker):
+    """Tests a sitemap's new URLs reach the output file in a single write."""
+    output_file = tmp_path / "output_batched.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://example.com/child.xml", output_file=str(output_file)
+    )
+    processor = SitemapProcessor(config=config)
+    # pylint: disable=protected-access
+    spy = mocker.spy(processor, "_write_urls")
+    processor.run()
+
+    spy.assert_called_once_with(
+        ["http://example.com/page1", "http://example.com/page2"]
+    )
+    assert output_file.read_text(encoding="utf-8") == (
+        "http://example.com/page1\nhttp://example.com/page2\n"
+    )
+
+
+def test_processor_resumes_sitemaps_cut_short_by_limit(tmp_path, patch_requests):
+    """Tests URLs skipped at the limit are found by a resumed run without one."""
+    output_file = tmp_path / "output_limit_resume.txt"
+    state_file = tmp_path / "state_limit_resume.json"
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(output_file),
+        state_file=str(state_file),
+        limit=2,
+    )
+    SitemapProcessor(config=config).run()
+    assert len(output_file.read_text(encoding="utf-8").split()) == 2
+
+    config.limit = None
+    config.resume = True
+    SitemapProcessor(config=config).run()
+
+    assert set(output_file.read_text(encoding="utf-8").split()) == {
+        "http://resume.com/pageA",
+        "http://resume.com/pageB",
+        "http://resume.com/pageC",
+        "http://resume.com/pageD",
+    }
+    final_state = json.loads(state_file.read_text(encoding="utf-8"))
+    assert not final_state["sitemap_queue"]
+    assert set(final_state["processed_sitemaps"]) == {
+        "http://resume.com/index.xml",
+        "http://resume.com/child1.xml",
+        "http://resume.com/child2.xml",
+    }
+
+
+def test_processor_limit_stops_queueing_index_children(tmp_path, patch_requests):
+    """Tests an index stops queueing children once they would cover the limit."""
+    output_file = tmp_path / "output_index_limit.txt"
+    state_file = tmp_path / "state_index_limit.json"
+
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(output_file),
+        state_file=str(state_file),
+        limit=1,
+    )
+    processor = SitemapProcessor(config=config)
+    processor.run()
+
+    assert output_file.read_text(encoding="utf-8").split() == [
+        "http://resume.com/pageA"
+    ]
+    final_state = json.loads(state_file.read_text(encoding="utf-8"))
+    assert "http://resume.com/child2.xml" not in final_state["processed_sitemaps"]
+    # The index and child1 were cut short, so both stay queued for a resume
+    assert set(final_state["sitemap_queue"]) == {
+        "http://resume.com/index.xml",
+        "http://resume.com/child1.xml",
+    }
+
+    config.limit = None
+    config.resume = True
+    SitemapProcessor(config=config).run()
+
+    assert len(output_file.read_text(encoding="utf-8").split()) == 4
+
+
+def test_processor_rereads_index_when_children_fall_short(tmp_path, patch_requests):
+    """Tests a cut-short index queues more children when the first ones fail."""
+    output_file = tmp_path / "output_fall_short.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://shortfall.com/index.xml",
+        output_file=str(output_file),
+        state_file=str(tmp_path / "state_fall_short.json"),
+        limit=1,
+    )
+    processor = SitemapProcessor(config=config)
+    processor.run()
+
+    assert output_file.read_text(encoding="utf-8").split() == [
+        "http://limited.com/page1"
+    ]
+    assert "http://shortfall.com/index.xml" in processor.processed_sitemaps
+
+
+def test_processor_saves_in_flight_sitemaps_in_queue(tmp_path):
+    """Tests a checkpoint keeps sitemaps that are still being fetched queued."""
+    config = ProcessorConfig(
+        sitemap_url="http://example.com/index.xml",
+        output_file=str(tmp_path / "output_in_flight.txt"),
+        state_file=str(tmp_path / "state_in_flight.json"),
+    )
+    processor = SitemapProcessor(config=config)
+    # pylint: disable=protected-access
+    processor._set_queue(["http://example.com/a.xml", "http://example.com/b.xml"])
+    in_flight = processor.sitemap_queue.popleft()  # As _drain_queue does
+
+    assert not processor._enqueue(in_flight)  # Still counted as queued
+    processor._save_state()
+
+    saved = json.loads((tmp_path / "state_in_flight.json").read_text("utf-8"))
+    assert saved["sitemap_queue"] == [
+        "http://example.com/a.xml",
+        "http://example.com/b.xml",
+    ]
+
+
+def test_processor_checkpoints_state_periodically(tmp_path, patch_requests, mocker):
+    """Tests state is saved every ``checkpoint_every`` sitemaps, not only at exit."""
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(tmp_path / "output_checkpoint.txt"),
+        state_file=str(tmp_path / "state_checkpoint.json"),
+        checkpoint_every=1,
+    )
+    processor = SitemapProcessor(config=config)
+    # pylint: disable=protected-access
+    mock_save_state = mocker.patch.object(
+        processor, "_save_state", wraps=processor._save_state
+    )
+
+    processor.run()
+
+    # One checkpoint per sitemap (index + 2 children) plus the final save
+    assert mock_save_state.call_count == 4
+
+
+def test_processor_replays_journal_on_resume(tmp_path, patch_requests, mocker, caplog):
+    """Tests a journal left by a crash before any snapshot is replayed on resume."""
+    state_file = tmp_path / "state_journal.json"
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(tmp_path / "output_journal.txt"),
+        state_file=str(state_file),
+    )
+    processor = SitemapProcessor(config=config)
+    # Simulate a crash before any snapshot: only the journal is written
+    mocker.patch.object(processor, "_save_state")
+    processor.run()
+    assert not state_file.exists()
+
+    config.resume = True
+    resumed = SitemapProcessor(config=config)
+    open_spy = mocker.spy(resumed.fetcher, "open_sitemap")
+    resumed.run()
+
+    assert "Replayed 3 journal entries" in caplog.text
+    assert resumed.processed_sitemaps == processor.processed_sitemaps
+    assert resumed.found_urls == processor.found_urls
+    open_spy.assert_not_called()  # Nothing journaled is fetched again
+
+
+def test_processor_add_urls_dedupes_batch_and_honors_limit(tmp_path):
+    """Tests a batch of page URLs is deduplicated and cut off at the limit."""
+    config = ProcessorConfig(
+        sitemap_url="http://example.com/child.xml",
+        output_file=str(tmp_path / "output_add_urls.txt"),
+        limit=3,
+    )
+    processor = SitemapProcessor(config=config)
+    processor.found_urls = {"http://example.com/a"}
+    batch = [
+        (False, url)
+        for url in ["http://example.com/b", "http://example.com/a"] * 2
+        + ["http://example.com/c", "http://example.com/d"]
+    ]
+    new_urls = []
+
+    # pylint: disable=protected-access
+    stop, added = processor._add_urls(batch, new_urls)
+
+    assert stop
+    assert added == 2
+    assert new_urls == ["http://example.com/b", "http://example.com/c"]
+    assert len(processor.found_urls) == 3
+
+
+def test_processor_gzipped_sitemaps(tmp_path, patch_requests):
+    """Tests a crawl through gzipped index and child sitemaps finds their URLs."""
+    output_file = tmp_path / "output_gz.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://gz.com/index.xml.gz",
+        output_file=str(output_file),
+        state_file=str(tmp_path / "state_gz.json"),
+    )
+    processor = SitemapProcessor(config=config)
+    processor.run()
+
+    assert output_file.read_text(encoding="utf-8").split() == [
+        "http://gz.com/page1",
+        "http://gz.com/page2",
+    ]
+    assert processor.processed_sitemaps == {
+        "http://gz.com/index.xml.gz",
+        "http://gz.com/sitemap.xml.gz",
+    }
+
+
+def test_processor_skips_non_http_locs(tmp_path, patch_requests, mocker):
+    """Tests <loc> values that are not http(s) URLs are neither fetched nor output."""
+    output_file = tmp_path / "output_schemes.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://schemes.com/index.xml",
+        output_file=str(output_file),
+        state_file=str(tmp_path / "state_schemes.json"),
+    )
+    processor = SitemapProcessor(config=config)
+    open_spy = mocker.spy(processor.fetcher, "open_sitemap")
+    processor.run()
+
+    assert [call.args[0] for call in open_spy.call_args_list] == [
+        "http://schemes.com/index.xml",
+        "HTTP://schemes.com/child.xml",
+    ]
+    assert output_file.read_text(encoding="utf-8").split() == [
+        "https://schemes.com/page1"
+    ]
+
+
+def test_processor_ignores_malformed_journal_entry(tmp_path, patch_requests, caplog):
+    """Tests a journal entry of the wrong shape is not replayed on resume."""
+    state_file = tmp_path / "state_bad_journal.json"
+    journal = tmp_path / "state_bad_journal.json.log"
+    journal.write_text(
+        json.dumps({"sitemap": "http://resume.com/index.xml", "new_urls": 5}) + "\n",
+        encoding="utf-8",
+    )
+    output_file = tmp_path / "output_bad_journal.txt"
+    config = ProcessorConfig(
+        sitemap_url="http://resume.com/index.xml",
+        output_file=str(output_file),
+        state_file=str(state_file),
+        resume=True,
+    )
+    SitemapProcessor(config=config).run()
+
+    assert "Replayed" not in caplog.text
+    assert len(output_file.read_text(encoding="utf-8").split()) == 4
@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from sitemap_fetcher.state_manager import StateManager
+
+STATE = {
+    "sitemap_queue": ["http://example.com/child.xml"],
+    "processed_sitemaps": ["http://example.com/index.xml"],
+    "found_urls": ["http://example.com/page1"],
+}
+
+
+# --- Tests for StateManager ---
+
+
+def test_state_manager_round_trip(tmp_path):
+    """Tests state saved by StateManager loads back unchanged."""
+    state_file = tmp_path / "state.json"
+
+    StateManager.save_state(str(state_file), STATE)
+
+    assert StateManager.load_state(str(state_file)) == STATE
+    # Compact encoding: no indentation or padding after separators
+    assert "\n" not in state_file.read_text(encoding="utf-8")
+
+
+def test_state_manager_save_is_atomic(tmp_path, mocker):
+    """Tests a failed save keeps the previous state file and leaves no temp file."""
+    state_file = tmp_path / "state.json"
+    StateManager.save_state(str(state_file), STATE)
+
+    mocker.patch(
+        "sitemap_fetcher.state_manager._dump", side_effect=IOError("Disk full")
+    )
+    with pytest.raises(IOError):
+        StateManager.save_state(str(state_file), {**STATE, "found_urls": []})
+
+    assert json.loads(state_file.read_text(encoding="utf-8")) == STATE
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False], ids=["orjson", "stdlib"])
+def test_state_manager_encoders_agree(tmp_path, monkeypatch, use_orjson):
+    """Tests both the orjson and stdlib encoders read and write plain JSON."""
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr("sitemap_fetcher.state_manager.orjson", None)
+    state_file = tmp_path / "state.json"
+
+    StateManager.save_state(str(state_file), STATE)
+
+    assert json.loads(state_file.read_text(encoding="utf-8")) == STATE
+    assert StateManager.load_state(str(state_file)) == STATE
+
+
+def test_state_manager_optional_sitemap_meta(tmp_path):
+    """Tests sitemap_meta may be absent but must be a dict when present."""
+    state_file = tmp_path / "state.json"
+
+    StateManager.save_state(str(state_file), {**STATE, "sitemap_meta": []})
+
+    with pytest.raises(ValueError, match="sitemap_meta"):
+        StateManager.load_state(str(state_file))
+
+
+def test_state_manager_journal_stops_at_torn_line(tmp_path):
+    """Tests reading a journal skips a last line cut short by a crash."""
+    journal = tmp_path / "state.json.log"
+    entry = {
+        "sitemap": "http://a.com/s.xml",
+        "new_urls": ["http://a.com/1"],
+        "children": [],
+    }
+    journal.write_bytes(
+        StateManager.encode_journal_entry(entry) + b'{"sitemap": "http://a.c'
+    )
+
+    assert list(StateManager.read_journal(str(journal))) == [entry]
+    assert not list(StateManager.read_journal(str(tmp_path / "missing.log")))
+
+
+def test_state_manager_rewrite_journal(tmp_path):
+    """Tests rewriting a journal replaces its contents with the given lines."""
+    journal = tmp_path / "state.json.log"
+    old = {"sitemap": "old", "new_urls": [], "children": []}
+    new = {"sitemap": "new", "new_urls": [], "children": []}
+    journal.write_bytes(StateManager.encode_journal_entry(old))
+    kept = [StateManager.encode_journal_entry(new)]
+
+    StateManager.rewrite_journal(str(journal), kept)
+
+    assert list(StateManager.read_journal(str(journal))) == [new]
+
+
+@pytest.mark.parametrize(
+    "bad_entry",
+    [
+        ["not", "a", "dict"],
+        {"new_urls": [], "children": []},
+        {"sitemap": "http://a.com/b.xml"},
+        {"sitemap": "http://a.com/b.xml", "new_urls": 5, "children": []},
+        {"sitemap": "http://a.com/b.xml", "new_urls": [], "children": {}},
+        {"sitemap": "http://a.com/b.xml", "new_urls": [], "children": [], "meta": []},
+    ],
+    ids=["not_dict", "no_sitemap", "no_lists", "bad_urls", "bad_children", "bad_meta"],
+)
+def test_state_manager_journal_stops_at_malformed_entry(tmp_path, bad_entry):
+    """Tests reading a journal stops at an entry replay could not apply."""
+    journal = tmp_path / "state.json.log"
+    good = {"sitemap": "http://a.com/a.xml", "new_urls": [], "children": []}
+    journal.write_bytes(
+        b"".join(
+            StateManager.encode_journal_entry(entry)
+            for entry in (good, bad_entry, good)
+        )
+    )
+
+    assert list(StateManager.read_journal(str(journal))) == [good]